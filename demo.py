@@ -3,36 +3,38 @@
 Flow Map Generator Demo
 流程图生成器演示
 
-This script demonstrates the capabilities of the FlowMapGenerator.
-该脚本演示FlowMapGenerator的功能。
+This script demonstrates the capabilities of the OptimizedFlowchartGenerator.
+该脚本演示OptimizedFlowchartGenerator的功能。
+
+The example flowcharts are independent, so they are rendered in parallel
+worker processes and written to disk by the parent process.
+示例流程图之间相互独立，因此在多个工作进程中并行渲染，由主进程写入磁盘。
 """
 
 import os
-import base64
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib
 matplotlib.use('Agg')
 
-from tools.flow_map import FlowMapGenerator
 
+OUTPUT_DIR = "demo_output"
 
-def save_image(image_base64: str, filename: str):
-    """Save base64 image to file / 将base64图片保存到文件"""
-    image_data = base64.b64decode(image_base64)
-    with open(filename, 'wb') as f:
-        f.write(image_data)
-    print(f"✓ Saved image to {filename}")
+# Per-process generator, created lazily in each worker / 每个工作进程惰性创建的生成器
+_generator = None
 
 
-def demo_markdown_examples():
-    """Demonstrate Markdown flowchart generation / 演示Markdown流程图生成"""
-    print("=" * 60)
-    print("Markdown Flowchart Examples / Markdown流程图示例")
-    print("=" * 60)
-    
-    generator = FlowMapGenerator()
-    
+def save_image(png_bytes: bytes, filename: str):
+    """Save PNG bytes to the output directory / 将PNG字节保存到输出目录"""
+    file_path = os.path.join(OUTPUT_DIR, filename)
+    with open(file_path, 'wb') as f:
+        f.write(png_bytes)
+    print(f"✓ Saved image to {file_path}")
+
+
+def markdown_examples():
+    """Markdown flowchart examples / Markdown流程图示例"""
     # Example 1: Simple Process Flow / 示例1：简单流程
-    print("\n1. Simple Process Flow / 简单流程:")
     markdown_text1 = """
     # User Registration Process
     1. Start registration
@@ -42,14 +44,8 @@ def demo_markdown_examples():
     5. Send confirmation email
     6. Complete registration
     """
-    
-    result = generator.from_markdown(markdown_text1, "left-right")
-    if result["success"]:
-        save_image(result["image"], "demo_markdown_simple.png")
-        print(f"   Nodes: {result['nodes_count']}, Connections: {result['connections_count']}")
-    
+
     # Example 2: Decision Flow / 示例2：决策流程
-    print("\n2. Decision Flow / 决策流程:")
     markdown_text2 = """
     - Begin process
     - Check user permissions?
@@ -58,14 +54,8 @@ def demo_markdown_examples():
     - Log activity
     - End process
     """
-    
-    result = generator.from_markdown(markdown_text2, "top-bottom")
-    if result["success"]:
-        save_image(result["image"], "demo_markdown_decision.png")
-        print(f"   Nodes: {result['nodes_count']}, Connections: {result['connections_count']}")
-    
+
     # Example 3: Chinese Content / 示例3：中文内容
-    print("\n3. Chinese Content / 中文内容:")
     chinese_text = """
     # 订单处理流程
     1. 开始处理订单
@@ -75,23 +65,17 @@ def demo_markdown_examples():
     5. 安排物流配送
     6. 完成订单处理
     """
-    
-    result = generator.from_markdown(chinese_text, "left-right")
-    if result["success"]:
-        save_image(result["image"], "demo_markdown_chinese.png")
-        print(f"   Nodes: {result['nodes_count']}, Connections: {result['connections_count']}")
 
+    return [
+        ("Simple Process Flow / 简单流程", "markdown", markdown_text1, "left-right", "demo_markdown_simple.png"),
+        ("Decision Flow / 决策流程", "markdown", markdown_text2, "top-bottom", "demo_markdown_decision.png"),
+        ("Chinese Content / 中文内容", "markdown", chinese_text, "left-right", "demo_markdown_chinese.png"),
+    ]
 
-def demo_mermaid_examples():
-    """Demonstrate Mermaid flowchart generation / 演示Mermaid流程图生成"""
-    print("\n" + "=" * 60)
-    print("Mermaid Flowchart Examples / Mermaid流程图示例")
-    print("=" * 60)
-    
-    generator = FlowMapGenerator()
-    
+
+def mermaid_examples():
+    """Mermaid flowchart examples / Mermaid流程图示例"""
     # Example 1: Basic Mermaid Flow / 示例1：基本Mermaid流程
-    print("\n1. Basic Mermaid Flow / 基本Mermaid流程:")
     mermaid_text1 = """
     graph TD
         A[Start] --> B{Check Status}
@@ -101,14 +85,8 @@ def demo_mermaid_examples():
         D --> F[End]
         E --> F
     """
-    
-    result = generator.from_mermaid(mermaid_text1, "top-bottom")
-    if result["success"]:
-        save_image(result["image"], "demo_mermaid_basic.png")
-        print(f"   Nodes: {result['nodes_count']}, Connections: {result['connections_count']}")
-    
+
     # Example 2: Complex Workflow / 示例2：复杂工作流
-    print("\n2. Complex Workflow / 复杂工作流:")
     mermaid_text2 = """
     graph LR
         A[User Input] --> B{Validate}
@@ -119,55 +97,98 @@ def demo_mermaid_examples():
         E --> G[Response]
         F --> G
     """
-    
-    result = generator.from_mermaid(mermaid_text2, "left-right")
-    if result["success"]:
-        save_image(result["image"], "demo_mermaid_complex.png")
-        print(f"   Nodes: {result['nodes_count']}, Connections: {result['connections_count']}")
+
+    return [
+        ("Basic Mermaid Flow / 基本Mermaid流程", "mermaid", mermaid_text1, "top-bottom", "demo_mermaid_basic.png"),
+        ("Complex Workflow / 复杂工作流", "mermaid", mermaid_text2, "left-right", "demo_mermaid_complex.png"),
+    ]
+
+
+def _render_one(task):
+    """
+    Render a single example in a worker process / 在工作进程中渲染单个示例
+
+    Returns (task, result) so the parent can report and save it.
+    返回 (task, result)，由主进程输出信息并保存图片。
+    """
+    # Imported here so the gevent patching done by dify_plugin (pulled in by the tools
+    # package) never reaches the parent before its worker pool is shut down
+    # 在此处导入，避免tools包引入的dify_plugin在主进程关闭进程池前完成gevent补丁
+    from tools.optimized_layout import OptimizedFlowchartGenerator
+
+    global _generator
+    if _generator is None:
+        _generator = OptimizedFlowchartGenerator()
+
+    _, input_format, text, layout, _ = task
+    if input_format == "markdown":
+        result = _generator.generate_from_markdown(text, layout)
+    else:
+        result = _generator.generate_from_mermaid(text, layout)
+    return task, result
+
+
+def demo_examples():
+    """Render all Markdown and Mermaid examples in parallel / 并行渲染所有Markdown和Mermaid示例"""
+    print("=" * 60)
+    print("Markdown & Mermaid Flowchart Examples / Markdown与Mermaid流程图示例")
+    print("=" * 60)
+
+    tasks = markdown_examples() + mermaid_examples()
+
+    with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as pool:
+        results = list(pool.map(_render_one, tasks))
+
+    for i, (task, result) in enumerate(results, 1):
+        name, input_format, _, _, filename = task
+        print(f"\n{i}. [{input_format}] {name}:")
+        if result["success"]:
+            save_image(result["png_bytes"], filename)
+            print(f"   Nodes: {result['nodes_count']}, Connections: {result['connections_count']}")
+        else:
+            print(f"   ✗ Failed: {result.get('error', 'Unknown error')}")
 
 
 def demo_tool_integration():
-    """Demonstrate FlowMapTool integration / 演示FlowMapTool集成"""
+    """Demonstrate Mermaid tool integration / 演示Mermaid工具集成"""
     print("\n" + "=" * 60)
     print("Tool Integration Demo / 工具集成演示")
     print("=" * 60)
-    
-    from tools.flow_map import FlowMapTool
-    
-    tool = FlowMapTool()
-    
-    # Test tool with different parameters / 使用不同参数测试工具
+
+    # Imported only after the worker pool is shut down, see _render_one / 仅在进程池关闭后导入，参见_render_one
+    from tools.mermaid_lr import MermaidLRTool
+    from tools.mermaid_tb import MermaidTBTool
+
+    # Test tools with different parameters / 使用不同参数测试工具
     test_cases = [
         {
-            "name": "Markdown Left-Right",
+            "name": "Mermaid Left-Right",
+            "tool": MermaidLRTool,
             "params": {
-                "text": "1. Start\n2. Process\n3. Decision?\n4. End",
-                "format": "markdown",
-                "layout": "left-right"
+                "text": "graph LR\nA[Start] --> B[Process]\nB --> C{Decision}\nC --> D[End]",
+                "theme": "modern"
             }
         },
         {
-            "name": "Mermaid Top-Bottom", 
+            "name": "Mermaid Top-Bottom",
+            "tool": MermaidTBTool,
             "params": {
                 "text": "graph TD\nA[Begin] --> B[Finish]",
-                "format": "mermaid",
-                "layout": "top-bottom"
+                "theme": "business"
             }
         }
     ]
-    
+
     for i, test_case in enumerate(test_cases, 1):
         print(f"\n{i}. {test_case['name']}:")
-        messages = list(tool._invoke(test_case['params']))
-        
-        if messages:
-            import json
-            result = json.loads(messages[0].message)
-            if result["success"]:
-                save_image(result["image"], f"demo_tool_{i}.png")
-                print(f"   ✓ Generated successfully with {result['nodes_count']} nodes")
+        tool = test_case["tool"](runtime=None, session=None)
+
+        for message in tool._invoke(test_case['params']):
+            blob = getattr(message.message, 'blob', None)
+            if blob is not None:
+                save_image(blob, f"demo_tool_{i}.png")
             else:
-                print(f"   ✗ Failed: {result.get('error', 'Unknown error')}")
+                print(f"   {message.message.text}")
 
 
 def main():
@@ -175,23 +196,21 @@ def main():
     print("🎨 Flow Map Generator Demo / 流程图生成器演示")
     print("This demo will generate several example flowcharts.")
     print("该演示将生成几个示例流程图。")
-    
+
     # Create output directory if it doesn't exist / 如果不存在则创建输出目录
-    os.makedirs("demo_output", exist_ok=True)
-    os.chdir("demo_output")
-    
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
     try:
         # Run demonstrations / 运行演示
-        demo_markdown_examples()
-        demo_mermaid_examples()
+        demo_examples()
         demo_tool_integration()
-        
+
         print("\n" + "=" * 60)
         print("🎉 Demo completed successfully! / 演示成功完成！")
-        print("Check the 'demo_output' folder for generated images.")
-        print("请查看'demo_output'文件夹中的生成图片。")
+        print(f"Check the '{OUTPUT_DIR}' folder for generated images.")
+        print(f"请查看'{OUTPUT_DIR}'文件夹中的生成图片。")
         print("=" * 60)
-        
+
     except Exception as e:
         print(f"\n❌ Demo failed: {e}")
         import traceback
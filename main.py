@@ -1,6 +1,9 @@
 from dify_plugin import Plugin, DifyPluginEnv
 
+from tools.optimized_layout import start_warm_up
+
 plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
 
 if __name__ == '__main__':
+    start_warm_up()
     plugin.run()
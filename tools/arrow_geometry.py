@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Arrow Geometry
+箭头几何计算
+
+Point-space emulation of ConnectionPatch's "->" arrow style, shared by the
+flowchart renderers so their connections can be drawn as one LineCollection.
+在磅空间中复现ConnectionPatch的"->"箭头样式，供各流程图渲染器共用，以便将连接绘制为一个LineCollection。
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+# "->" head: length 0.4 and half-width 0.2 of the mutation scale / "->"箭头：长0.4、半宽0.2倍缩放
+_HEAD_LENGTH = 0.4
+_HEAD_WIDTH = 0.2
+_HEAD_DIST = np.hypot(_HEAD_LENGTH, _HEAD_WIDTH)
+_COS_T = _HEAD_LENGTH / _HEAD_DIST
+_SIN_T = _HEAD_WIDTH / _HEAD_DIST
+
+
+def axes_point_scale(ax) -> np.ndarray:
+    """
+    Points per data unit along x and y for the axes' current limits
+    按坐标轴当前范围计算x、y方向每个数据单位对应的磅数
+    """
+    fig_width, fig_height = ax.figure.get_size_inches()
+    bbox = ax.get_position()
+    x_min, x_max = ax.get_xlim()
+    y_min, y_max = ax.get_ylim()
+    return np.array([bbox.width * fig_width * 72.0 / (x_max - x_min),
+                     bbox.height * fig_height * 72.0 / (y_max - y_min)])
+
+
+def arrow_segments(ax, starts: np.ndarray, ends: np.ndarray, shrink_a, shrink_b, mutation,
+                   linewidth: float) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Shaft and head polylines (data coordinates) for "->" arrows between point pairs
+    计算成对端点之间"->"箭头的箭身和箭头折线（数据坐标）
+
+    Shrink, head size and the projected-cap pad are in points, as for
+    ConnectionPatch. Like ConnectionPatch, an end is left unshrunk when the
+    remaining path lies entirely inside its shrink circle.
+    收缩量、箭头大小和端点补偿以磅为单位，与ConnectionPatch一致；
+    剩余路径完全位于收缩圆内时，与ConnectionPatch一样不收缩该端。
+
+    Returns the segments (shaft then head per arrow) and the indices of the
+    pairs that produced them.
+    返回线段列表（每个箭头依次为箭身和箭头）以及对应的端点对索引。
+    """
+    scale = axes_point_scale(ax)
+    count = len(starts)
+    starts = np.asarray(starts, dtype=float) * scale
+    ends = np.asarray(ends, dtype=float) * scale
+    shrink_a = np.broadcast_to(np.asarray(shrink_a, dtype=float), (count,))
+    shrink_b = np.broadcast_to(np.asarray(shrink_b, dtype=float), (count,))
+    head_dist = (_HEAD_DIST * np.broadcast_to(np.asarray(mutation, dtype=float), (count,)))[:, None]
+
+    lengths = np.hypot(*(ends - starts).T)
+    keep = lengths > 0
+    unit = np.divide(ends - starts, lengths[:, None], out=np.zeros_like(starts), where=keep[:, None])
+
+    # An end is only shrunk when the path leaves its circle / 仅当路径离开收缩圆时才收缩该端
+    shift_a = np.where(lengths > shrink_a, shrink_a, 0.0)
+    shift_b = np.where(lengths - shift_a > shrink_b, shrink_b, 0.0)
+
+    tails = starts + unit * shift_a[:, None]
+    tips = ends - unit * (shift_b + 0.5 * linewidth / _SIN_T)[:, None]
+    back_x, back_y = -unit[:, :1] * head_dist, -unit[:, 1:] * head_dist
+    wing_1 = tips + np.hstack([_COS_T * back_x + _SIN_T * back_y, -_SIN_T * back_x + _COS_T * back_y])
+    wing_2 = tips + np.hstack([_COS_T * back_x - _SIN_T * back_y, _SIN_T * back_x + _COS_T * back_y])
+
+    kept = np.flatnonzero(keep)
+    segments = []
+    for i in kept:
+        segments.append(np.array([tails[i], tips[i]]) / scale)
+        segments.append(np.array([wing_1[i], tips[i], wing_2[i]]) / scale)
+    return segments, kept
@@ -7,20 +7,128 @@ Specialized layout algorithms optimized for English text rendering.
 专门为英文文本渲染优化的布局算法。
 """
 
-import os
-import re
-import datetime
+import functools
+import io
+import textwrap
+import threading
+from collections import namedtuple
 from typing import Any, Dict, List, Tuple, Optional
 
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
-import matplotlib.patheffects as PathEffects
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import FancyBboxPatch, Polygon
+from matplotlib.collections import LineCollection, PatchCollection
 import matplotlib.font_manager as fm
 import numpy as np
 
+from .arrow_geometry import arrow_segments
+
+
+# Preferred English font families in priority order / 按优先级排列的英文字体
+ENGLISH_FONT_FAMILIES = (
+    'Arial', 'Helvetica', 'Calibri', 'Segoe UI',
+    'Times New Roman', 'Georgia', 'DejaVu Sans'
+)
+
+
+# Share of the figure the default subplot box covered (0.775 x 0.77). Drawings keep this
+# data-unit-to-inch scale with the axes filling the figure, so node and canvas sizes stay
+# in proportion to the point-sized text / 默认子图框占画布的比例（0.775 x 0.77）。坐标轴铺满画布时
+# 仍保持该数据单位与英寸的比例，使节点和画布尺寸与以磅为单位的文字保持原有比例
+_AXES_SCALE_X = matplotlib.rcParamsDefault['figure.subplot.right'] - matplotlib.rcParamsDefault['figure.subplot.left']
+_AXES_SCALE_Y = matplotlib.rcParamsDefault['figure.subplot.top'] - matplotlib.rcParamsDefault['figure.subplot.bottom']
+
+
+# Entries kept in the node size memo before it is reset / 节点尺寸缓存重置前保留的条目数
+_NODE_SIZE_CACHE_SIZE = 1024
+
+
+# Normalized node / edge records used on the render path / 渲染路径使用的规范化节点与连接记录
+EnglishNode = namedtuple('EnglishNode', 'id label type')
+EnglishEdge = namedtuple('EnglishEdge', 'source target')
+
+
+# Themes optimized for English text, shared read-only by all generators / 针对英文文本优化的主题，所有生成器只读共享
+_ENGLISH_THEMES = {
+    'modern': {
+        'background': '#FFFFFF',
+        'node_colors': {
+            'start': '#4CAF50',
+            'process': '#2196F3',
+            'decision': '#FF9800',
+            'end': '#F44336',
+            'default': '#9C27B0'
+        },
+        'text_color': '#FFFFFF',
+        'border_color': '#FFFFFF',
+        'connection_color': '#424242',
+        'connection_width': 2.0
+    }
+}
+
+
+def _normalize_nodes(nodes: List[Any]) -> List[EnglishNode]:
+    """
+    Convert node dicts into EnglishNode records, filling label/type defaults once;
+    (id, label, type) tuples such as the parser's FlowNode are reused as-is
+    将节点字典转换为EnglishNode记录，一次性填充label/type默认值；
+    解析器产生的FlowNode等(id, label, type)元组直接复用
+    """
+    if nodes and isinstance(nodes[0], tuple):
+        return nodes
+    return [EnglishNode(node['id'], node.get('label', ''), node.get('type', 'default')) for node in nodes]
+
+
+def _normalize_edges(connections: List[Any]) -> List[EnglishEdge]:
+    """
+    Convert connection dicts or FlowEdge records into EnglishEdge records
+    将连接字典或FlowEdge记录转换为EnglishEdge记录
+    """
+    if connections and isinstance(connections[0], tuple):
+        return [EnglishEdge(c[0], c[1]) for c in connections]
+    return [EnglishEdge(c['from'], c['to']) for c in connections]
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_english_font() -> fm.FontProperties:
+    """
+    Resolve the first installed English font once per process
+    每个进程只解析一次第一个可用的英文字体
+    """
+    for font_name in ENGLISH_FONT_FAMILIES:
+        prop = fm.FontProperties(family=font_name)
+        try:
+            fm.findfont(prop, fallback_to_default=False)
+            return prop
+        except ValueError:
+            continue
+    
+    return fm.FontProperties()
+
+
+@functools.lru_cache(maxsize=1024)
+def _wrap_english_text(text: str, chars_per_line: int) -> str:
+    """
+    Wrap English text on word boundaries into at most 3 lines
+    按单词边界将英文文本换行，最多3行
+    """
+    words = text.split()
+    if not words:
+        return text
+    
+    # 不拆分长单词，与逐词贪心换行结果一致
+    lines = textwrap.wrap(' '.join(words), width=max(1, chars_per_line),
+                          break_long_words=False, break_on_hyphens=False)
+    
+    # 最多3行
+    if len(lines) > 3:
+        lines = lines[:3]
+        lines[-1] = lines[-1][:chars_per_line-3] + "..."
+    
+    return '\n'.join(lines)
+
 
 class EnglishFlowchartGenerator:
     """
@@ -31,8 +139,15 @@ class EnglishFlowchartGenerator:
     accounting for different character widths, word spacing, and text flow patterns.
     """
     
-    def __init__(self):
+    def __init__(self, dpi: int = 150, png_compress_level: int = 1):
         """Initialize the English layout generator"""
+        # PNG output settings: resolution and zlib level (1 = fastest) / PNG输出设置：分辨率和zlib压缩级别（1为最快）
+        self.dpi = dpi
+        self.png_compress_level = png_compress_level
+        
+        # Per-thread reusable figure / 每个线程复用的图形对象
+        self._local = threading.local()
+        
         # English-optimized node dimensions / 英文优化的节点尺寸
         self.node_width = 3.2   # 为英文文本提供更宽的节点
         self.node_height = 1.2  # 适当增加高度以适应可能的换行
@@ -54,9 +169,10 @@ class EnglishFlowchartGenerator:
         self.branch_spacing_multiplier = 2.8  # 分支场景间距倍数
         self.complex_branch_multiplier = 3.2  # 复杂分支间距倍数
         
-        # Setup output directory / 设置输出目录
-        self.output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'test', 'demo_output')
-        os.makedirs(self.output_dir, exist_ok=True)
+        # Node shape factories keyed by node type / 按节点类型索引的形状工厂
+        self._shape_factories = {
+            'decision': self._create_english_diamond_patch,
+        }
         
         # Setup font / 设置字体
         self.font = self._setup_font()
@@ -64,73 +180,50 @@ class EnglishFlowchartGenerator:
         # Theme support / 主题支持
         self.current_theme = 'modern'
         self.themes = self._initialize_themes()
+        
+        # Node size cache keyed by label, reset once full / 按标签缓存的节点尺寸，满后重置
+        self._node_size_cache: Dict[str, Tuple[float, float]] = {}
     
     def _setup_font(self):
         """Setup font for English text rendering"""
-        try:
-            # Use system default English fonts
-            english_fonts = [
-                'Arial', 'Helvetica', 'Calibri', 'Segoe UI', 
-                'Times New Roman', 'Georgia', 'DejaVu Sans'
-            ]
-            
-            for font_name in english_fonts:
-                try:
-                    prop = fm.FontProperties(family=font_name)
-                    return prop
-                except:
-                    continue
-            
-            return fm.FontProperties()
-            
-        except Exception as e:
-            print(f"Warning: Could not setup English font: {e}")
-            return fm.FontProperties()
+        return _resolve_english_font()
     
     def _initialize_themes(self):
         """Initialize themes optimized for English text"""
-        return {
-            'modern': {
-                'background': '#FFFFFF',
-                'node_colors': {
-                    'start': '#4CAF50',
-                    'process': '#2196F3',
-                    'decision': '#FF9800',
-                    'end': '#F44336',
-                    'default': '#9C27B0'
-                },
-                'text_color': '#FFFFFF',
-                'border_color': '#FFFFFF',
-                'connection_color': '#424242',
-                'connection_width': 2.0
-            }
-        }
+        return _ENGLISH_THEMES
     
     def analyze_english_text(self, nodes: List[Dict]) -> Dict[str, Any]:
         """
         Analyze English text characteristics for optimal layout
         分析英文文本特征以优化布局
         """
-        total_chars = 0
-        total_words = 0
+        return self._scan_nodes(_normalize_nodes(nodes))
+    
+    def _scan_nodes(self, nodes: List[EnglishNode]) -> Dict[str, Any]:
+        """
+        Collect text statistics and node sizes in a single pass over the nodes
+        单次遍历节点，同时统计文本特征和节点尺寸
+        """
+        node_count = len(nodes)
+        lengths = np.empty(node_count, dtype=np.int32)
+        word_counts = np.empty(node_count, dtype=np.int32)
+        sizes = np.empty((node_count, 2), dtype=float)
         max_word_length = 0
-        long_text_nodes = 0
         
-        for node in nodes:
-            label = node.get('label', '')
+        for i, node in enumerate(nodes):
+            label = node.label
             words = label.split()
-            total_words += len(words)
-            total_chars += len(label)
-            
+            lengths[i] = len(label)
+            word_counts[i] = len(words)
             if words:
-                max_word_length = max(max_word_length, max(len(word) for word in words))
-            
-            # 检测长文本节点
-            if len(label) > self.word_break_threshold:
-                long_text_nodes += 1
+                max_word_length = max(max_word_length, max(map(len, words)))
+            sizes[i] = self.calculate_english_node_size(label)
+        
+        # 检测长文本节点
+        long_text_nodes = int(np.count_nonzero(lengths > self.word_break_threshold))
         
-        avg_chars_per_node = total_chars / len(nodes) if nodes else 0
-        avg_words_per_node = total_words / len(nodes) if nodes else 0
+        avg_chars_per_node = float(lengths.mean()) if nodes else 0
+        avg_words_per_node = float(word_counts.mean()) if nodes else 0
         
         return {
             'avg_chars_per_node': avg_chars_per_node,
@@ -138,7 +231,11 @@ class EnglishFlowchartGenerator:
             'max_word_length': max_word_length,
             'long_text_nodes': long_text_nodes,
             'has_long_text': long_text_nodes > 0,
-            'text_complexity': self._determine_text_complexity(avg_chars_per_node, max_word_length)
+            'text_complexity': self._determine_text_complexity(avg_chars_per_node, max_word_length),
+            # 节点尺寸（float64，文本换行按宽度取整，降精度会改变换行结果）
+            'sizes': sizes,
+            'max_node_width': float(sizes[:, 0].max()) if nodes else 0,
+            'max_node_height': float(sizes[:, 1].max()) if nodes else 0
         }
     
     def _determine_text_complexity(self, avg_chars: float, max_word: int) -> str:
@@ -155,6 +252,10 @@ class EnglishFlowchartGenerator:
         Calculate optimal node size for English text
         为英文文本计算最佳节点尺寸
         """
+        cached = self._node_size_cache.get(label)
+        if cached is not None:
+            return cached
+        
         words = label.split()
         char_count = len(label)
         
@@ -183,9 +284,12 @@ class EnglishFlowchartGenerator:
             width = base_width
             height = base_height
         
+        if len(self._node_size_cache) >= _NODE_SIZE_CACHE_SIZE:
+            self._node_size_cache.clear()
+        self._node_size_cache[label] = (width, height)
         return width, height
     
-    def calculate_english_grid_layout(self, nodes: List[Dict], layout: str) -> Tuple[int, int]:
+    def calculate_english_grid_layout(self, nodes: List[Dict], layout: str, text_analysis: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
         """
         Calculate optimal grid layout for English text nodes
         为英文文本节点计算最佳网格布局
@@ -194,7 +298,8 @@ class EnglishFlowchartGenerator:
         if node_count == 0:
             return 1, 1
         
-        text_analysis = self.analyze_english_text(nodes)
+        if text_analysis is None:
+            text_analysis = self.analyze_english_text(nodes)
         
         # 根据文本复杂度调整网格策略
         if text_analysis["text_complexity"] == "complex":
@@ -226,21 +331,17 @@ class EnglishFlowchartGenerator:
         
         return rows, cols
     
-    def calculate_english_canvas_size(self, nodes: List[Dict], layout: str, rows: int, cols: int) -> Tuple[float, float]:
+    def calculate_english_canvas_size(self, nodes: List[Dict], layout: str, rows: int, cols: int, text_analysis: Optional[Dict[str, Any]] = None) -> Tuple[float, float]:
         """
         Calculate canvas size optimized for English text
         为英文文本优化画布尺寸计算
         """
-        text_analysis = self.analyze_english_text(nodes)
+        if text_analysis is None:
+            text_analysis = self.analyze_english_text(nodes)
         
         # 计算实际需要的节点尺寸
-        max_node_width = 0
-        max_node_height = 0
-        
-        for node in nodes:
-            width, height = self.calculate_english_node_size(node.get('label', ''))
-            max_node_width = max(max_node_width, width)
-            max_node_height = max(max_node_height, height)
+        max_node_width = text_analysis['max_node_width']
+        max_node_height = text_analysis['max_node_height']
         
         # 使用实际最大节点尺寸计算画布
         effective_h_spacing = self.horizontal_spacing
@@ -267,13 +368,16 @@ class EnglishFlowchartGenerator:
         
         return canvas_width, canvas_height
     
-    def calculate_english_positions(self, nodes: List[Dict], layout: str, canvas_width: float, canvas_height: float, rows: int, cols: int) -> Dict[str, Tuple[float, float]]:
+    def calculate_english_positions(self, nodes: List[Dict], layout: str, canvas_width: float, canvas_height: float, rows: int, cols: int, sizes: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Calculate precise positions for English text nodes
         为英文文本节点计算精确位置
+        
+        Returns an (N, 2) float32 array of node centres in node order.
+        返回按节点顺序排列的 (N, 2) float32 节点中心坐标数组。
         """
-        positions = {}
-        text_analysis = self.analyze_english_text(nodes)
+        if sizes is None:
+            sizes = self._scan_nodes(_normalize_nodes(nodes))['sizes']
         
         # 计算可用空间
         available_width = canvas_width - 2 * self.margin_x
@@ -296,31 +400,29 @@ class EnglishFlowchartGenerator:
         x_spacing = max(x_spacing, min_x_spacing)
         y_spacing = max(y_spacing, min_y_spacing)
         
-        # 计算节点位置
-        for i, node in enumerate(nodes):
-            if layout == "left-right":
-                row = i // cols
-                col = i % cols
-            else:  # top-bottom
-                col = i // rows
-                row = i % rows
-            
-            # 计算基础位置
-            x = self.margin_x + x_spacing * (col + 0.5)
-            y = canvas_height - self.margin_y - y_spacing * (row + 0.5)
-            
-            # 边界检查和调整
-            node_width, node_height = self.calculate_english_node_size(node.get('label', ''))
-            
-            # 确保节点完全在画布内
-            x = max(self.margin_x + node_width/2, min(canvas_width - self.margin_x - node_width/2, x))
-            y = max(self.margin_y + node_height/2, min(canvas_height - self.margin_y - node_height/2, y))
-            
-            positions[node['id']] = (x, y)
+        # 计算节点所在的行列
+        index = np.arange(len(nodes))
+        if layout == "left-right":
+            row, col = np.divmod(index, cols)
+        else:  # top-bottom
+            col, row = np.divmod(index, rows)
+        
+        # 计算基础位置
+        xs = self.margin_x + x_spacing * (col + 0.5)
+        ys = canvas_height - self.margin_y - y_spacing * (row + 0.5)
+        
+        # 确保节点完全在画布内
+        half_widths = sizes[:, 0] / 2
+        half_heights = sizes[:, 1] / 2
+        xs = np.maximum(self.margin_x + half_widths, np.minimum(canvas_width - self.margin_x - half_widths, xs))
+        ys = np.maximum(self.margin_y + half_heights, np.minimum(canvas_height - self.margin_y - half_heights, ys))
         
+        positions = np.empty((len(nodes), 2), dtype=np.float32)
+        positions[:, 0] = xs
+        positions[:, 1] = ys
         return positions
     
-    def generate_english_flowchart(self, nodes: List[Dict], connections: List[Dict], layout: str, input_type: str) -> str:
+    def generate_english_flowchart(self, nodes: List[Dict], connections: List[Dict], layout: str, input_type: str) -> bytes:
         """
         Generate flowchart optimized for English text with branch-aware layout
         生成针对英文文本优化的流程图，支持分支感知布局
@@ -328,28 +430,42 @@ class EnglishFlowchartGenerator:
         if not nodes:
             raise ValueError("No nodes to generate flowchart")
         
-        # 分析文本特征和结构
-        text_analysis = self.analyze_english_text(nodes)
+        # 一次性规范化节点和连接，后续直接访问属性
+        english_nodes = _normalize_nodes(nodes)
+        edges = _normalize_edges(connections)
         
-        # 借用主生成器的结构分析方法
-        from .optimized_layout import OptimizedFlowchartGenerator
-        temp_generator = OptimizedFlowchartGenerator()
-        structure_analysis = temp_generator._analyze_flowchart_structure(nodes, connections)
+        # 单次遍历分析文本特征和节点尺寸
+        text_analysis = self._scan_nodes(english_nodes)
+        
+        # 借用主生成器的结构分析函数
+        from .optimized_layout import analyze_flowchart_structure
+        structure_analysis = analyze_flowchart_structure(english_nodes, edges)
+        
+        # 节点尺寸按节点顺序存放在数组中
+        sizes = text_analysis['sizes']
         
         # 根据分支结构选择布局算法
         if structure_analysis['has_branches']:
             # 有分支：使用自由布局
             canvas_width, canvas_height = self._calculate_branch_canvas_size(nodes, connections, layout)
             positions = self._calculate_english_free_positions(nodes, connections, layout, canvas_width, canvas_height)
+            pos_array = np.array([positions[node.id] for node in english_nodes], dtype=np.float32)
         else:
             # 无分支：使用网格布局
-            rows, cols = self.calculate_english_grid_layout(nodes, layout)
-            canvas_width, canvas_height = self.calculate_english_canvas_size(nodes, layout, rows, cols)
-            positions = self.calculate_english_positions(nodes, layout, canvas_width, canvas_height, rows, cols)
+            rows, cols = self.calculate_english_grid_layout(nodes, layout, text_analysis)
+            canvas_width, canvas_height = self.calculate_english_canvas_size(nodes, layout, rows, cols, text_analysis)
+            pos_array = self.calculate_english_positions(nodes, layout, canvas_width, canvas_height, rows, cols, sizes)
+        
+        # 节点ID到数组下标的映射，连接绘制直接按下标取坐标
+        id_to_idx = {node.id: i for i, node in enumerate(english_nodes)}
         
         # 创建图形
         theme = self.themes[self.current_theme]
-        fig, ax = plt.subplots(figsize=(canvas_width, canvas_height))
+        fig = self._get_figure()
+        fig.set_size_inches(canvas_width * _AXES_SCALE_X, canvas_height * _AXES_SCALE_Y)
+        ax = fig.add_subplot(111)
+        # 坐标轴铺满画布，边距已由margin_x/margin_y预留，无需tight裁剪
+        fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
         fig.patch.set_facecolor(theme['background'])
         ax.set_xlim(0, canvas_width)
         ax.set_ylim(0, canvas_height)
@@ -357,58 +473,73 @@ class EnglishFlowchartGenerator:
         ax.set_facecolor(theme['background'])
         
         # 绘制节点
-        for node in nodes:
-            self._draw_english_node(ax, node, positions[node['id']], theme)
+        self._draw_english_nodes(ax, english_nodes, pos_array, sizes, theme)
         
         # 绘制连接
-        for connection in connections:
-            self._draw_english_connection(ax, connection, positions, theme)
+        self._draw_english_connections(ax, edges, id_to_idx, pos_array, theme)
         
-        # 生成文件名
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        layout_suffix = "lr" if layout == "left-right" else "tb"
-        filename = f"english_flowchart_{input_type}_{layout_suffix}_{timestamp}.png"
-        file_path = os.path.join(self.output_dir, filename)
+        # 在内存中渲染PNG
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=self.dpi,
+                    facecolor=theme['background'], edgecolor='none',
+                    pil_kwargs={'compress_level': self.png_compress_level})
+        fig.clear()
         
-        # 保存文件
-        plt.savefig(file_path, format='png', dpi=300, bbox_inches='tight', 
-                   facecolor=theme['background'], edgecolor='none', pad_inches=0.1)
-        plt.close(fig)
-        
-        return file_path
+        return buffer.getvalue()
     
-    def _draw_english_node(self, ax, node: Dict, position: Tuple[float, float], theme: Dict):
-        """Draw a node optimized for English text"""
-        x, y = position
-        label = node.get('label', '')
-        node_type = node.get('type', 'default')
-        
-        # 获取节点尺寸
-        width, height = self.calculate_english_node_size(label)
-        
-        # 获取颜色
-        color = theme['node_colors'].get(node_type, theme['node_colors']['default'])
-        text_color = theme['text_color']
-        
-        # 绘制节点形状
-        if node_type == 'decision':
-            # 菱形
-            diamond_points = [
-                [x, y + height/2], [x + width/2, y],
-                [x, y - height/2], [x - width/2, y]
-            ]
-            from matplotlib.patches import Polygon
-            patch = Polygon(diamond_points, facecolor=color, edgecolor='white', linewidth=2)
+    def _get_figure(self):
+        """
+        Return this thread's reusable figure, cleared and ready for drawing
+        返回当前线程可复用的图形对象（已清空）
+        """
+        fig = getattr(self._local, 'fig', None)
+        if fig is None:
+            # 直接使用Agg画布，不经过pyplot的全局图形管理
+            fig = Figure()
+            FigureCanvasAgg(fig)
+            self._local.fig = fig
         else:
-            # 矩形或圆角矩形
-            style = "round,pad=0.1" if node_type in ['start', 'end'] else "round,pad=0.02"
-            patch = FancyBboxPatch((x - width/2, y - height/2), width, height,
-                                 boxstyle=style, facecolor=color, edgecolor='white', linewidth=2)
+            fig.clear()
+        return fig
+    
+    def _draw_english_nodes(self, ax, nodes: List[EnglishNode], pos_array: np.ndarray, sizes: np.ndarray, theme: Dict):
+        """
+        Draw all English nodes as one patch collection, then their labels
+        将所有英文节点绘制为一个图形集合，然后绘制文本
+        """
+        node_colors = theme['node_colors']
+        default_color = node_colors['default']
+        patches = []
+        
+        # 按节点类型选择形状工厂
+        for node, (x, y), (width, height) in zip(nodes, pos_array, sizes):
+            node_type = node.type
+            color = node_colors.get(node_type, default_color)
+            factory = self._shape_factories.get(node_type, self._create_english_box_patch)
+            patches.append(factory(x, y, width, height, node_type, color))
         
-        ax.add_patch(patch)
+        ax.add_collection(PatchCollection(patches, match_original=True))
         
         # 绘制文本
-        self._draw_english_text(ax, x, y, label, text_color, width)
+        text_color = theme['text_color']
+        for node, (x, y), (width, _) in zip(nodes, pos_array, sizes):
+            self._draw_english_text(ax, x, y, node.label, text_color, width)
+    
+    def _create_english_diamond_patch(self, x: float, y: float, width: float, height: float,
+                                      node_type: str, color: str):
+        """Create a diamond patch for decision nodes / 为判断节点创建菱形"""
+        diamond_points = [
+            [x, y + height/2], [x + width/2, y],
+            [x, y - height/2], [x - width/2, y]
+        ]
+        return Polygon(diamond_points, facecolor=color, edgecolor='white', linewidth=2)
+    
+    def _create_english_box_patch(self, x: float, y: float, width: float, height: float,
+                                  node_type: str, color: str):
+        """Create a (rounded) rectangle patch / 创建矩形或圆角矩形"""
+        style = "round,pad=0.1" if node_type in ('start', 'end') else "round,pad=0.02"
+        return FancyBboxPatch((x - width/2, y - height/2), width, height,
+                              boxstyle=style, facecolor=color, edgecolor='white', linewidth=2)
     
     def _draw_english_text(self, ax, x: float, y: float, text: str, color: str, node_width: float):
         """Draw English text with optimal formatting"""
@@ -437,49 +568,28 @@ class EnglishFlowchartGenerator:
     
     def _format_english_text(self, text: str, node_width: float) -> str:
         """Format English text for optimal display"""
-        words = text.split()
-        if not words:
-            return text
-        
         # 估算每行可容纳的字符数
         chars_per_line = int(node_width / self.avg_char_width * 0.8)  # 留20%边距
-        
-        lines = []
-        current_line = ""
-        
-        for word in words:
-            test_line = current_line + (" " if current_line else "") + word
-            if len(test_line) <= chars_per_line:
-                current_line = test_line
-            else:
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
-        
-        if current_line:
-            lines.append(current_line)
-        
-        # 最多3行
-        if len(lines) > 3:
-            lines = lines[:3]
-            lines[-1] = lines[-1][:chars_per_line-3] + "..."
-        
-        return '\n'.join(lines)
+        return _wrap_english_text(text, chars_per_line)
     
-    def _draw_english_connection(self, ax, connection: Dict, positions: Dict, theme: Dict):
-        """Draw connection between English nodes"""
-        from_id = connection['from']
-        to_id = connection['to']
-        
-        if from_id not in positions or to_id not in positions:
+    def _draw_english_connections(self, ax, edges: List[EnglishEdge], id_to_idx: Dict[str, int],
+                                  pos_array: np.ndarray, theme: Dict):
+        """
+        Draw all connections between English nodes as one line collection
+        将所有英文节点间的连接绘制为一个线段集合
+        """
+        index_pairs = [(id_to_idx[edge.source], id_to_idx[edge.target]) for edge in edges
+                       if edge.source in id_to_idx and edge.target in id_to_idx]
+        if not index_pairs:
             return
         
-        from_pos = positions[from_id]
-        to_pos = positions[to_id]
+        from_idx, to_idx = np.array(index_pairs, dtype=np.intp).T
+        # 与ConnectionPatch(shrinkA=shrinkB=45, mutation_scale=20)一致的"->"箭头
+        segments, _ = arrow_segments(ax, pos_array[from_idx], pos_array[to_idx], 45.0, 45.0, 20.0,
+                                     theme['connection_width'])
         
-        # 绘制箭头连接
-        arrow = ConnectionPatch(from_pos, to_pos, "data", "data",
-                              arrowstyle="->", shrinkA=45, shrinkB=45,
-                              mutation_scale=20, fc=theme['connection_color'], 
-                              ec=theme['connection_color'], linewidth=theme['connection_width'])
-        ax.add_patch(arrow)
\ No newline at end of file
+        collection = LineCollection(segments,
+                                    colors=theme['connection_color'],
+                                    linewidths=theme['connection_width'],
+                                    capstyle='round', joinstyle='round')
+        ax.add_collection(collection)
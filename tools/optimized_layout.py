@@ -9,24 +9,419 @@ Provides compact layout algorithms for flowcharts to better utilize space.
 
 import os
 import io
-import base64
+import functools
 import re
-import json
-import datetime
+import itertools
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
 from typing import Any, Dict, List, Tuple, Optional
 
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import matplotlib.patches as mpatches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
+from matplotlib.patches import FancyBboxPatch, Polygon, Rectangle
+from matplotlib.collections import LineCollection, PatchCollection
 import matplotlib.patheffects as PathEffects  # 添加路径效果支持
 import matplotlib.font_manager as fm
 import numpy as np
-from PIL import Image
 
 # Import English layout generator / 导入英文布局生成器
 from .english_layout import EnglishFlowchartGenerator
+from .arrow_geometry import arrow_segments
+from .render_cache import png_cache
+
+# Sequence number appended to saved filenames / 附加到保存文件名的序号
+_SAVE_SEQUENCE = itertools.count()
+
+# Markdown list item: numbered ("1. Step", tried first) or bullet ("- Step", content may be empty)
+# Markdown列表项：编号列表（"1. 步骤"，优先匹配）或项目符号列表（"- 步骤"，内容可为空）
+_LIST_ITEM_RE = re.compile(r'\d+\.\s*(?P<numbered>.+)|[-*+]\s*(?P<bullet>.*)')
+
+# Header and comment lines skipped before edge matching / 在匹配连接前跳过的头部和注释行
+_MERMAID_SKIP_PREFIXES = ('graph', 'flowchart', '%%')
+
+# Mermaid edge: source node, arrow (optionally labelled), target node / Mermaid连接：源节点、箭头（可带标签）、目标节点
+# Arrow forms, tried in order / 箭头形式按顺序尝试:
+#   A -->|标签| B   带标签箭头 (优先匹配)
+#   A -- 标签 --> B 带标签箭头 (支持用户提供的语法)
+#   A --> B         普通箭头（源和目标都可能有形状标签）
+_MERMAID_EDGE_RE = re.compile(
+    r'(?P<from_id>\w+)(?P<from_shape>\[.*?\]|\{.*?\}|\(.*?\))?\s*'
+    r'(?:-->\s*\|(?P<pipe_label>.+?)\||--\s*(?P<dash_label>[^-]+?)\s*-->|-->)'
+    r'\s*(?P<to_id>\w+)(?P<to_shape>\[.*?\]|\{.*?\}|\(.*?\))?'
+)
+
+# Node type keywords, matched as substrings of the lower-cased label / 节点类型关键词，按小写标签的子串匹配
+_START_KEYWORDS_RE = re.compile('|'.join(map(re.escape, ('start', 'begin', '开始', '启动'))))
+_END_KEYWORDS_RE = re.compile('|'.join(map(re.escape, ('end', 'finish', 'complete', '结束', '完成'))))
+_DECISION_KEYWORDS_RE = re.compile('|'.join(map(re.escape, ('?', 'if', 'decide', 'choice', '判断', '选择', '决策', '是否'))))
+_PROCESS_KEYWORDS_RE = re.compile('|'.join(map(re.escape, ('process', 'handle', 'execute', '处理', '执行'))))
+
+# Mermaid node type by (opening, closing) shape bracket / 按Mermaid形状首尾括号确定节点类型
+_MERMAID_SHAPE_TYPES = {('[', ']'): 'process', ('{', '}'): 'decision', ('(', ')'): 'start'}
+
+# Entries kept in the connection label color memo before it is reset / 连接标签颜色缓存重置前保留的条目数
+_CONNECTION_COLOR_CACHE_SIZE = 1024
+
+# Parsed flowchart records / 解析后的流程图记录
+FlowNode = namedtuple('FlowNode', 'id label type')
+# Edges also carry the endpoints' indices into the node list, assigned once by the parser
+# 连接同时携带端点在节点列表中的下标，由解析器一次性分配
+FlowEdge = namedtuple('FlowEdge', 'source target label source_idx target_idx')
+
+# Struct-of-arrays view of a parsed graph for vectorized layout/draw / 解析图的结构数组视图，用于向量化布局与绘制
+GraphArrays = namedtuple('GraphArrays', 'ids labels types edges_src edges_dst edge_labels')
+
+# Default directory for saved PNGs, resolved once at import / 保存PNG的默认目录，导入时解析一次
+_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'test', 'demo_output'))
+
+# Opening/closing brackets of a Mermaid node shape / Mermaid节点形状的首尾括号
+_MERMAID_OPENING_BRACKETS = '[{('
+_MERMAID_CLOSING_BRACKETS = ']})'
+
+
+# Color themes, built once at import and shared read-only by all generators / 颜色主题，导入时构建一次，所有生成器只读共享
+_THEMES = {
+    'modern': {
+        'name': 'Modern / 现代',
+        'background': '#FFFFFF',
+        'node_colors': {
+            'start': '#4CAF50',    # Material Green / 质感绿
+            'process': '#2196F3',  # Material Blue / 质感蓝
+            'decision': '#FF9800', # Material Orange / 质感橙
+            'end': '#F44336',      # Material Red / 质感红
+            'default': '#9C27B0'   # Material Purple / 质感紫
+        },
+        'text_color': '#FFFFFF',
+        'border_color': '#FFFFFF',
+        'connection_color': '#424242',
+        'connection_width': 2.0,
+        # 带标签箭头的颜色配置（中英文支持）
+        'connection_label_colors': {
+            # 中文标签
+            '通过': '#4CAF50',    # 绿色 - 成功
+            '是': '#4CAF50',        # 绿色 - 肯定
+            '成功': '#4CAF50',      # 绿色 - 成功
+            '正确': '#4CAF50',      # 绿色 - 正确
+            '不通过': '#F44336',  # 红色 - 失败
+            '否': '#F44336',        # 红色 - 否定
+            '失败': '#F44336',      # 红色 - 失败
+            '错误': '#F44336',      # 红色 - 错误
+            '可能': '#FF9800',      # 橙色 - 不确定
+            '待定': '#FF9800',      # 橙色 - 待定
+            # 英文标签
+            'approved': '#4CAF50',    # Green - Success
+            'yes': '#4CAF50',         # Green - Positive
+            'success': '#4CAF50',     # Green - Success
+            'correct': '#4CAF50',     # Green - Correct
+            'true': '#4CAF50',        # Green - True
+            'rejected': '#F44336',    # Red - Failure
+            'no': '#F44336',          # Red - Negative
+            'failed': '#F44336',      # Red - Failed
+            'error': '#F44336',       # Red - Error
+            'false': '#F44336',       # Red - False
+            'maybe': '#FF9800',       # Orange - Uncertain
+            'pending': '#FF9800',     # Orange - Pending
+            'default': '#424242'      # 默认颜色
+        }
+    },
+    'business': {
+        'name': 'Business / 商务',
+        'background': '#F5F5F5',
+        'node_colors': {
+            'start': '#1976D2',    # Deep Blue / 深蓝
+            'process': '#0277BD',  # Light Blue / 浅蓝
+            'decision': '#F57C00', # Deep Orange / 深橙
+            'end': '#388E3C',      # Green / 绿色
+            'default': '#5D4037'   # Brown / 棕色
+        },
+        'text_color': '#FFFFFF',
+        'border_color': '#37474F',
+        'connection_color': '#37474F',
+        'connection_width': 1.8,
+        # 带标签箭头的颜色配置（中英文支持）
+        'connection_label_colors': {
+            # 中文标签
+            '通过': '#388E3C',    # 绿色 - 成功  
+            '是': '#388E3C',        # 绿色 - 肯定
+            '成功': '#388E3C',      # 绿色 - 成功
+            '正确': '#388E3C',      # 绿色 - 正确
+            '不通过': '#D32F2F',  # 红色 - 失败
+            '否': '#D32F2F',        # 红色 - 否定
+            '失败': '#D32F2F',      # 红色 - 失败
+            '错误': '#D32F2F',      # 红色 - 错误
+            '可能': '#F57C00',      # 橙色 - 不确定
+            '待定': '#F57C00',      # 橙色 - 待定
+            # 英文标签
+            'approved': '#388E3C',    # Green - Success
+            'yes': '#388E3C',         # Green - Positive
+            'success': '#388E3C',     # Green - Success
+            'correct': '#388E3C',     # Green - Correct
+            'true': '#388E3C',        # Green - True
+            'rejected': '#D32F2F',    # Red - Failure
+            'no': '#D32F2F',          # Red - Negative
+            'failed': '#D32F2F',      # Red - Failed
+            'error': '#D32F2F',       # Red - Error
+            'false': '#D32F2F',       # Red - False
+            'maybe': '#F57C00',       # Orange - Uncertain
+            'pending': '#F57C00',     # Orange - Pending
+            'default': '#37474F'      # 默认颜色
+        }
+    },
+    'tech': {
+        'name': 'Technology / 科技',
+        'background': '#121212',
+        'node_colors': {
+            'start': '#00E676',    # Bright Green / 亮绿
+            'process': '#00BCD4',  # Cyan / 青色
+            'decision': '#FF6D00', # Deep Orange / 深橙
+            'end': '#E91E63',      # Pink / 粉红
+            'default': '#9C27B0'   # Purple / 紫色
+        },
+        'text_color': '#FFFFFF',
+        'border_color': '#FFFFFF',
+        'connection_color': '#FFFFFF',
+        'connection_width': 2.2,
+        # 带标签箭头的颜色配置（中英文支持）
+        'connection_label_colors': {
+            # 中文标签
+            '通过': '#00E676',    # 亮绿色 - 成功
+            '是': '#00E676',        # 亮绿色 - 肯定
+            '成功': '#00E676',      # 亮绿色 - 成功
+            '正确': '#00E676',      # 亮绿色 - 正确
+            '不通过': '#FF1744',  # 亮红色 - 失败
+            '否': '#FF1744',        # 亮红色 - 否定
+            '失败': '#FF1744',      # 亮红色 - 失败
+            '错误': '#FF1744',      # 亮红色 - 错误
+            '可能': '#FF6D00',      # 亮橙色 - 不确定
+            '待定': '#FF6D00',      # 亮橙色 - 待定
+            # 英文标签
+            'approved': '#00E676',    # Bright Green - Success
+            'yes': '#00E676',         # Bright Green - Positive
+            'success': '#00E676',     # Bright Green - Success
+            'correct': '#00E676',     # Bright Green - Correct
+            'true': '#00E676',        # Bright Green - True
+            'rejected': '#FF1744',    # Bright Red - Failure
+            'no': '#FF1744',          # Bright Red - Negative
+            'failed': '#FF1744',      # Bright Red - Failed
+            'error': '#FF1744',       # Bright Red - Error
+            'false': '#FF1744',       # Bright Red - False
+            'maybe': '#FF6D00',       # Bright Orange - Uncertain
+            'pending': '#FF6D00',     # Bright Orange - Pending
+            'default': '#FFFFFF'      # 默认颜色
+        }
+    },
+    'minimal': {
+        'name': 'Minimal / 简约',
+        'background': '#FAFAFA',
+        'node_colors': {
+            'start': '#616161',    # Grey 600
+            'process': '#757575',  # Grey 600
+            'decision': '#9E9E9E', # Grey 500
+            'end': '#424242',      # Grey 800
+            'default': '#6A6A6A'   # Grey
+        },
+        'text_color': '#FFFFFF',
+        'border_color': '#9E9E9E',
+        'connection_color': '#616161',
+        'connection_width': 1.5,
+        # 带标签箭头的颜色配置（中英文支持）
+        'connection_label_colors': {
+            # 中文标签
+            '通过': '#689F38',    # 深绿色 - 成功
+            '是': '#689F38',        # 深绿色 - 肯定
+            '成功': '#689F38',      # 深绿色 - 成功
+            '正确': '#689F38',      # 深绿色 - 正确
+            '不通过': '#C62828',  # 深红色 - 失败
+            '否': '#C62828',        # 深红色 - 否定
+            '失败': '#C62828',      # 深红色 - 失败
+            '错误': '#C62828',      # 深红色 - 错误
+            '可能': '#EF6C00',      # 深橙色 - 不确定
+            '待定': '#EF6C00',      # 深橙色 - 待定
+            # 英文标签
+            'approved': '#689F38',    # Deep Green - Success
+            'yes': '#689F38',         # Deep Green - Positive
+            'success': '#689F38',     # Deep Green - Success
+            'correct': '#689F38',     # Deep Green - Correct
+            'true': '#689F38',        # Deep Green - True
+            'rejected': '#C62828',    # Deep Red - Failure
+            'no': '#C62828',          # Deep Red - Negative
+            'failed': '#C62828',      # Deep Red - Failed
+            'error': '#C62828',       # Deep Red - Error
+            'false': '#C62828',       # Deep Red - False
+            'maybe': '#EF6C00',       # Deep Orange - Uncertain
+            'pending': '#EF6C00',     # Deep Orange - Pending
+            'default': '#616161'      # 默认颜色
+        }
+    },
+    'classic': {
+        'name': 'Classic / 经典',
+        'background': '#FFFFFF',
+        'node_colors': {
+            'start': '#90EE90',    # Light Green
+            'process': '#87CEEB',  # Sky Blue  
+            'decision': '#FFB6C1', # Light Pink
+            'end': '#FFA07A',      # Light Salmon
+            'default': '#E6E6FA'   # Lavender
+        },
+        'text_color': '#000000',
+        'border_color': '#666666',
+        'connection_color': '#333333',
+        'connection_width': 1.5,
+        # 带标签箭头的颜色配置（中英文支持）
+        'connection_label_colors': {
+            # 中文标签
+            '通过': '#4CAF50',    # 绿色 - 成功
+            '是': '#4CAF50',        # 绿色 - 肯定
+            '成功': '#4CAF50',      # 绿色 - 成功
+            '正确': '#4CAF50',      # 绿色 - 正确
+            '不通过': '#F44336',  # 红色 - 失败
+            '否': '#F44336',        # 红色 - 否定
+            '失败': '#F44336',      # 红色 - 失败
+            '错误': '#F44336',      # 红色 - 错误
+            '可能': '#FF9800',      # 橙色 - 不确定
+            '待定': '#FF9800',      # 橙色 - 待定
+            # 英文标签
+            'approved': '#4CAF50',    # Green - Success
+            'yes': '#4CAF50',         # Green - Positive
+            'success': '#4CAF50',     # Green - Success
+            'correct': '#4CAF50',     # Green - Correct
+            'true': '#4CAF50',        # Green - True
+            'rejected': '#F44336',    # Red - Failure
+            'no': '#F44336',          # Red - Negative
+            'failed': '#F44336',      # Red - Failed
+            'error': '#F44336',       # Red - Error
+            'false': '#F44336',       # Red - False
+            'maybe': '#FF9800',       # Orange - Uncertain
+            'pending': '#FF9800',     # Orange - Pending
+            'default': '#333333'      # 默认颜色
+        }
+    }
+}
+
+
+def analyze_flowchart_structure(nodes: List[FlowNode], connections: List[FlowEdge]) -> Dict[str, Any]:
+    """
+    Analyze flowchart structure to detect branches and decision points
+    分析流程图结构以检测分支和决策点
+    """
+    # Build connection graph / 构建连接图
+    outgoing_connections = defaultdict(list)
+    incoming_connections = defaultdict(list)
+    
+    for connection in connections:
+        # Track outgoing and incoming connections / 跟踪出向和入向连接
+        outgoing_connections[connection.source].append(connection)
+        incoming_connections[connection.target].append(connection)
+    
+    # Plain dicts for callers, so lookups of unconnected nodes never insert keys / 返回普通字典，查询无连接节点时不会插入键
+    outgoing_connections = dict(outgoing_connections)
+    incoming_connections = dict(incoming_connections)
+    out_degree = {node_id: len(edges) for node_id, edges in outgoing_connections.items()}
+    in_degree = {node_id: len(edges) for node_id, edges in incoming_connections.items()}
+    
+    # Single pass over nodes for branch, decision and merge detection and branching complexity
+    # 单次遍历节点，检测分支、决策和合并节点并计算分支复杂度
+    branch_nodes = []
+    decision_nodes = []
+    merge_nodes = []
+    max_branches = 0
+    total_branches = 0
+    
+    for node in nodes:
+        node_id = node.id
+        outgoing_count = out_degree.get(node_id, 0)
+        if outgoing_count > max_branches:
+            max_branches = outgoing_count
+        
+        # Node with multiple outgoing connections is a branch point / 有多个出向连接的节点是分支点
+        if outgoing_count > 1:
+            branch_nodes.append(node_id)
+            total_branches += outgoing_count - 1
+            
+            # Check if it's explicitly a decision node / 检查是否明确是决策节点
+            if node.type == 'decision' or '{' in node.label:
+                decision_nodes.append(node_id)
+        
+        # Node with multiple incoming connections is a merge point / 有多个入向连接的节点是合并点
+        if in_degree.get(node_id, 0) > 1:
+            merge_nodes.append(node_id)
+    
+    has_branches = len(branch_nodes) > 0
+    has_complex_branches = max_branches > 2 or total_branches > 2
+    
+    return {
+        'has_branches': has_branches,
+        'has_complex_branches': has_complex_branches,
+        'branch_nodes': branch_nodes,
+        'decision_nodes': decision_nodes,
+        'merge_nodes': merge_nodes,
+        'max_branches': max_branches,
+        'total_branches': total_branches,
+        'outgoing_connections': outgoing_connections,
+        'incoming_connections': incoming_connections
+    }
+
+
+
+def build_graph_arrays(nodes: List[FlowNode], connections: List[FlowEdge]) -> GraphArrays:
+    """
+    Convert parsed node/edge records into parallel arrays, edges as node indices
+    将解析出的节点/连接记录转换为并行数组，连接以节点下标表示
+    """
+    edge_count = len(connections)
+    return GraphArrays(
+        ids=np.array([node.id for node in nodes], dtype=object),
+        labels=np.array([node.label for node in nodes], dtype=object),
+        types=np.array([node.type for node in nodes], dtype=object),
+        edges_src=np.fromiter((c.source_idx for c in connections), dtype=np.int32, count=edge_count),
+        edges_dst=np.fromiter((c.target_idx for c in connections), dtype=np.int32, count=edge_count),
+        edge_labels=[c.label for c in connections]
+    )
+
+
+def _iter_lines(text: str):
+    """
+    Lazily yield stripped, non-blank lines
+    惰性返回去除首尾空白后的非空行
+    """
+    return filter(None, map(str.strip, text.splitlines()))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_chinese_font() -> fm.FontProperties:
+    """
+    Resolve the Chinese font once per process
+    每个进程只解析一次中文字体
+    """
+    try:
+        # Try local font file first
+        font_path = os.path.join(os.path.dirname(__file__), '..', 'fonts', 'chinese_font.ttc')
+        if os.path.exists(font_path):
+            prop = fm.FontProperties(fname=font_path)
+            return prop
+        
+        # Fallback to system fonts
+        chinese_fonts = [
+            'SimHei', 'Microsoft YaHei', 'PingFang SC', 
+            'Hiragino Sans GB', 'WenQuanYi Micro Hei', 'DejaVu Sans'
+        ]
+        
+        for font_name in chinese_fonts:
+            try:
+                prop = fm.FontProperties(family=font_name)
+                return prop
+            except:
+                continue
+        
+        return fm.FontProperties()
+        
+    except Exception as e:
+        print(f"Warning: Could not setup Chinese font: {e}")
+        return fm.FontProperties()
 
 
 class OptimizedFlowchartGenerator:
@@ -35,11 +430,36 @@ class OptimizedFlowchartGenerator:
     优化的流程图生成器，支持紧凑布局
     """
     
+    # Fixed attribute set: no per-instance __dict__ and faster attribute reads (current_theme is a property)
+    # 固定的属性集合：无实例__dict__，属性读取更快（current_theme为属性方法）
+    __slots__ = (
+        'fig_size', 'dpi', 'png_compress_level',
+        '_fig', '_canvas', '_ax', '_render_lock',
+        'node_width', 'node_height', 'english_node_width', 'english_node_height',
+        'horizontal_spacing', 'vertical_spacing', 'margin_x', 'margin_y',
+        'themes', '_theme_state', '_connection_colors',
+        'node_shapes', '_patch_factories', 'output_dir', 'chinese_font',
+        'shadow_enabled', 'gradient_enabled', 'border_width', 'shadow_offset',
+        'max_text_length_short', 'max_text_length_medium',
+        'min_nodes_per_row', 'max_nodes_per_row', 'min_nodes_per_col', 'max_nodes_per_col',
+        'english_generator'
+    )
+    
     def __init__(self):
         """Initialize the generator"""
         # Compact figure size / 紧凑的图形尺寸
         self.fig_size = (10, 6)
         
+        # PNG output settings: resolution and zlib level (1 = fastest) / PNG输出设置：分辨率和zlib压缩级别（1为最快）
+        self.dpi = 150
+        self.png_compress_level = 1
+        
+        # Persistent Agg figure and axes reused by every render, guarded by a lock / 所有渲染复用的Agg图形和坐标轴，由锁保护
+        self._fig = Figure(figsize=self.fig_size)
+        self._canvas = FigureCanvasAgg(self._fig)
+        self._ax = self._fig.add_subplot(111)
+        self._render_lock = threading.Lock()
+        
         # Optimized node dimensions / 优化的节点尺寸
         self.node_width = 2.2   # 减小宽度，提高空间利用率
         self.node_height = 1.0  # 减小高度，提高空间利用率
@@ -58,6 +478,11 @@ class OptimizedFlowchartGenerator:
         
         # Visual enhancement: Theme system / 视觉增强：主题系统
         self.themes = self._initialize_themes()
+        # Theme selection is per thread so a shared generator can serve concurrent requests
+        # 主题选择按线程保存，共享的生成器可同时服务多个请求
+        self._theme_state = threading.local()
+        # (theme name, connection label) -> resolved color / （主题名，连接标签）到解析颜色的缓存
+        self._connection_colors = {}
         self.current_theme = 'modern'  # Default theme / 默认主题（改为现代主题）
         
         # Node shapes for different types / 不同类型的节点形状
@@ -68,13 +493,18 @@ class OptimizedFlowchartGenerator:
             'end': 'round',        # Rounded rectangle / 圆角矩形
             'default': 'rect'      # Rectangle / 矩形
         }
+        # Patch builder per shape; unknown shapes fall back to a rectangle / 每种形状的图形构造方法，未知形状回退为矩形
+        self._patch_factories = {
+            'diamond': self._make_diamond_patch,
+            'round': self._make_round_patch,
+            'rect': self._make_rect_patch
+        }
         
         # Setup output directory / 设置输出目录
-        self.output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'test', 'demo_output')
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.output_dir = _OUTPUT_DIR
         
         # Setup Chinese font
-        self.chinese_font = self._setup_chinese_font()
+        self.chinese_font = _get_chinese_font()
         
         # Visual enhancement parameters / 视觉增强参数
         self.shadow_enabled = True      # Enable shadow effects / 启用阴影效果
@@ -91,230 +521,23 @@ class OptimizedFlowchartGenerator:
         self.max_nodes_per_col = 8        # 每列最多节点数
         
         # Initialize English layout generator / 初始化英文布局生成器
-        self.english_generator = EnglishFlowchartGenerator()
+        self.english_generator = EnglishFlowchartGenerator(dpi=self.dpi, png_compress_level=self.png_compress_level)
     
     def _initialize_themes(self):
         """
         Initialize color themes for different visual styles
         初始化不同视觉风格的颜色主题
         """
-        return {
-            'modern': {
-                'name': 'Modern / 现代',
-                'background': '#FFFFFF',
-                'node_colors': {
-                    'start': '#4CAF50',    # Material Green / 质感绿
-                    'process': '#2196F3',  # Material Blue / 质感蓝
-                    'decision': '#FF9800', # Material Orange / 质感橙
-                    'end': '#F44336',      # Material Red / 质感红
-                    'default': '#9C27B0'   # Material Purple / 质感紫
-                },
-                'text_color': '#FFFFFF',
-                'border_color': '#FFFFFF',
-                'connection_color': '#424242',
-                'connection_width': 2.0,
-                # 带标签箭头的颜色配置（中英文支持）
-                'connection_label_colors': {
-                    # 中文标签
-                    '通过': '#4CAF50',    # 绿色 - 成功
-                    '是': '#4CAF50',        # 绿色 - 肯定
-                    '成功': '#4CAF50',      # 绿色 - 成功
-                    '正确': '#4CAF50',      # 绿色 - 正确
-                    '不通过': '#F44336',  # 红色 - 失败
-                    '否': '#F44336',        # 红色 - 否定
-                    '失败': '#F44336',      # 红色 - 失败
-                    '错误': '#F44336',      # 红色 - 错误
-                    '可能': '#FF9800',      # 橙色 - 不确定
-                    '待定': '#FF9800',      # 橙色 - 待定
-                    # 英文标签
-                    'approved': '#4CAF50',    # Green - Success
-                    'yes': '#4CAF50',         # Green - Positive
-                    'success': '#4CAF50',     # Green - Success
-                    'correct': '#4CAF50',     # Green - Correct
-                    'true': '#4CAF50',        # Green - True
-                    'rejected': '#F44336',    # Red - Failure
-                    'no': '#F44336',          # Red - Negative
-                    'failed': '#F44336',      # Red - Failed
-                    'error': '#F44336',       # Red - Error
-                    'false': '#F44336',       # Red - False
-                    'maybe': '#FF9800',       # Orange - Uncertain
-                    'pending': '#FF9800',     # Orange - Pending
-                    'default': '#424242'      # 默认颜色
-                }
-            },
-            'business': {
-                'name': 'Business / 商务',
-                'background': '#F5F5F5',
-                'node_colors': {
-                    'start': '#1976D2',    # Deep Blue / 深蓝
-                    'process': '#0277BD',  # Light Blue / 浅蓝
-                    'decision': '#F57C00', # Deep Orange / 深橙
-                    'end': '#388E3C',      # Green / 绿色
-                    'default': '#5D4037'   # Brown / 棕色
-                },
-                'text_color': '#FFFFFF',
-                'border_color': '#37474F',
-                'connection_color': '#37474F',
-                'connection_width': 1.8,
-                # 带标签箭头的颜色配置（中英文支持）
-                'connection_label_colors': {
-                    # 中文标签
-                    '通过': '#388E3C',    # 绿色 - 成功  
-                    '是': '#388E3C',        # 绿色 - 肯定
-                    '成功': '#388E3C',      # 绿色 - 成功
-                    '正确': '#388E3C',      # 绿色 - 正确
-                    '不通过': '#D32F2F',  # 红色 - 失败
-                    '否': '#D32F2F',        # 红色 - 否定
-                    '失败': '#D32F2F',      # 红色 - 失败
-                    '错误': '#D32F2F',      # 红色 - 错误
-                    '可能': '#F57C00',      # 橙色 - 不确定
-                    '待定': '#F57C00',      # 橙色 - 待定
-                    # 英文标签
-                    'approved': '#388E3C',    # Green - Success
-                    'yes': '#388E3C',         # Green - Positive
-                    'success': '#388E3C',     # Green - Success
-                    'correct': '#388E3C',     # Green - Correct
-                    'true': '#388E3C',        # Green - True
-                    'rejected': '#D32F2F',    # Red - Failure
-                    'no': '#D32F2F',          # Red - Negative
-                    'failed': '#D32F2F',      # Red - Failed
-                    'error': '#D32F2F',       # Red - Error
-                    'false': '#D32F2F',       # Red - False
-                    'maybe': '#F57C00',       # Orange - Uncertain
-                    'pending': '#F57C00',     # Orange - Pending
-                    'default': '#37474F'      # 默认颜色
-                }
-            },
-            'tech': {
-                'name': 'Technology / 科技',
-                'background': '#121212',
-                'node_colors': {
-                    'start': '#00E676',    # Bright Green / 亮绿
-                    'process': '#00BCD4',  # Cyan / 青色
-                    'decision': '#FF6D00', # Deep Orange / 深橙
-                    'end': '#E91E63',      # Pink / 粉红
-                    'default': '#9C27B0'   # Purple / 紫色
-                },
-                'text_color': '#FFFFFF',
-                'border_color': '#FFFFFF',
-                'connection_color': '#FFFFFF',
-                'connection_width': 2.2,
-                # 带标签箭头的颜色配置（中英文支持）
-                'connection_label_colors': {
-                    # 中文标签
-                    '通过': '#00E676',    # 亮绿色 - 成功
-                    '是': '#00E676',        # 亮绿色 - 肯定
-                    '成功': '#00E676',      # 亮绿色 - 成功
-                    '正确': '#00E676',      # 亮绿色 - 正确
-                    '不通过': '#FF1744',  # 亮红色 - 失败
-                    '否': '#FF1744',        # 亮红色 - 否定
-                    '失败': '#FF1744',      # 亮红色 - 失败
-                    '错误': '#FF1744',      # 亮红色 - 错误
-                    '可能': '#FF6D00',      # 亮橙色 - 不确定
-                    '待定': '#FF6D00',      # 亮橙色 - 待定
-                    # 英文标签
-                    'approved': '#00E676',    # Bright Green - Success
-                    'yes': '#00E676',         # Bright Green - Positive
-                    'success': '#00E676',     # Bright Green - Success
-                    'correct': '#00E676',     # Bright Green - Correct
-                    'true': '#00E676',        # Bright Green - True
-                    'rejected': '#FF1744',    # Bright Red - Failure
-                    'no': '#FF1744',          # Bright Red - Negative
-                    'failed': '#FF1744',      # Bright Red - Failed
-                    'error': '#FF1744',       # Bright Red - Error
-                    'false': '#FF1744',       # Bright Red - False
-                    'maybe': '#FF6D00',       # Bright Orange - Uncertain
-                    'pending': '#FF6D00',     # Bright Orange - Pending
-                    'default': '#FFFFFF'      # 默认颜色
-                }
-            },
-            'minimal': {
-                'name': 'Minimal / 简约',
-                'background': '#FAFAFA',
-                'node_colors': {
-                    'start': '#616161',    # Grey 600
-                    'process': '#757575',  # Grey 600
-                    'decision': '#9E9E9E', # Grey 500
-                    'end': '#424242',      # Grey 800
-                    'default': '#6A6A6A'   # Grey
-                },
-                'text_color': '#FFFFFF',
-                'border_color': '#9E9E9E',
-                'connection_color': '#616161',
-                'connection_width': 1.5,
-                # 带标签箭头的颜色配置（中英文支持）
-                'connection_label_colors': {
-                    # 中文标签
-                    '通过': '#689F38',    # 深绿色 - 成功
-                    '是': '#689F38',        # 深绿色 - 肯定
-                    '成功': '#689F38',      # 深绿色 - 成功
-                    '正确': '#689F38',      # 深绿色 - 正确
-                    '不通过': '#C62828',  # 深红色 - 失败
-                    '否': '#C62828',        # 深红色 - 否定
-                    '失败': '#C62828',      # 深红色 - 失败
-                    '错误': '#C62828',      # 深红色 - 错误
-                    '可能': '#EF6C00',      # 深橙色 - 不确定
-                    '待定': '#EF6C00',      # 深橙色 - 待定
-                    # 英文标签
-                    'approved': '#689F38',    # Deep Green - Success
-                    'yes': '#689F38',         # Deep Green - Positive
-                    'success': '#689F38',     # Deep Green - Success
-                    'correct': '#689F38',     # Deep Green - Correct
-                    'true': '#689F38',        # Deep Green - True
-                    'rejected': '#C62828',    # Deep Red - Failure
-                    'no': '#C62828',          # Deep Red - Negative
-                    'failed': '#C62828',      # Deep Red - Failed
-                    'error': '#C62828',       # Deep Red - Error
-                    'false': '#C62828',       # Deep Red - False
-                    'maybe': '#EF6C00',       # Deep Orange - Uncertain
-                    'pending': '#EF6C00',     # Deep Orange - Pending
-                    'default': '#616161'      # 默认颜色
-                }
-            },
-            'classic': {
-                'name': 'Classic / 经典',
-                'background': '#FFFFFF',
-                'node_colors': {
-                    'start': '#90EE90',    # Light Green
-                    'process': '#87CEEB',  # Sky Blue  
-                    'decision': '#FFB6C1', # Light Pink
-                    'end': '#FFA07A',      # Light Salmon
-                    'default': '#E6E6FA'   # Lavender
-                },
-                'text_color': '#000000',
-                'border_color': '#666666',
-                'connection_color': '#333333',
-                'connection_width': 1.5,
-                # 带标签箭头的颜色配置（中英文支持）
-                'connection_label_colors': {
-                    # 中文标签
-                    '通过': '#4CAF50',    # 绿色 - 成功
-                    '是': '#4CAF50',        # 绿色 - 肯定
-                    '成功': '#4CAF50',      # 绿色 - 成功
-                    '正确': '#4CAF50',      # 绿色 - 正确
-                    '不通过': '#F44336',  # 红色 - 失败
-                    '否': '#F44336',        # 红色 - 否定
-                    '失败': '#F44336',      # 红色 - 失败
-                    '错误': '#F44336',      # 红色 - 错误
-                    '可能': '#FF9800',      # 橙色 - 不确定
-                    '待定': '#FF9800',      # 橙色 - 待定
-                    # 英文标签
-                    'approved': '#4CAF50',    # Green - Success
-                    'yes': '#4CAF50',         # Green - Positive
-                    'success': '#4CAF50',     # Green - Success
-                    'correct': '#4CAF50',     # Green - Correct
-                    'true': '#4CAF50',        # Green - True
-                    'rejected': '#F44336',    # Red - Failure
-                    'no': '#F44336',          # Red - Negative
-                    'failed': '#F44336',      # Red - Failed
-                    'error': '#F44336',       # Red - Error
-                    'false': '#F44336',       # Red - False
-                    'maybe': '#FF9800',       # Orange - Uncertain
-                    'pending': '#FF9800',     # Orange - Pending
-                    'default': '#333333'      # 默认颜色
-                }
-            }
-        }
+        return _THEMES
+    
+    @property
+    def current_theme(self) -> str:
+        """Theme name selected by the calling thread / 当前线程选择的主题名称"""
+        return getattr(self._theme_state, 'name', 'modern')
+    
+    @current_theme.setter
+    def current_theme(self, theme_name: str):
+        self._theme_state.name = theme_name
     
     def set_theme(self, theme_name: str):
         """
@@ -337,17 +560,34 @@ class OptimizedFlowchartGenerator:
         """
         return self.themes[self.current_theme]
     
-    def _get_connection_color(self, connection_label: str) -> str:
+    def _get_connection_color(self, connection_label: str, theme: Optional[Dict[str, Any]] = None) -> str:
         """
         Get connection color based on label
         根据标签获取连接颜色
         """
-        theme = self.get_current_theme()
-        label_colors = theme.get('connection_label_colors', {})
+        if theme is None:
+            theme = self.get_current_theme()
         
         if not connection_label:
             return theme['connection_color']
         
+        # Labels repeat across edges and renders, so resolved colors are memoized per theme
+        # 标签在连接和多次渲染间重复出现，因此按主题缓存解析出的颜色
+        key = (theme['name'], connection_label)
+        color = self._connection_colors.get(key)
+        if color is None:
+            if len(self._connection_colors) >= _CONNECTION_COLOR_CACHE_SIZE:
+                self._connection_colors.clear()
+            color = self._connection_colors[key] = self._resolve_connection_color(connection_label, theme)
+        return color
+    
+    def _resolve_connection_color(self, connection_label: str, theme: Dict[str, Any]) -> str:
+        """
+        Match a non-empty label against the theme's label colors
+        将非空标签与主题的标签颜色进行匹配
+        """
+        label_colors = theme.get('connection_label_colors', {})
+        
         # 检查精确匹配
         if connection_label in label_colors:
             return label_colors[connection_label]
@@ -362,37 +602,31 @@ class OptimizedFlowchartGenerator:
         return label_colors.get('default', theme['connection_color'])
     
     def _setup_chinese_font(self):
-        """Setup Chinese font for matplotlib"""
-        try:
-            # Try local font file first
-            font_path = os.path.join(os.path.dirname(__file__), '..', 'fonts', 'chinese_font.ttc')
-            if os.path.exists(font_path):
-                prop = fm.FontProperties(fname=font_path)
-                return prop
-            
-            # Fallback to system fonts
-            chinese_fonts = [
-                'SimHei', 'Microsoft YaHei', 'PingFang SC', 
-                'Hiragino Sans GB', 'WenQuanYi Micro Hei', 'DejaVu Sans'
-            ]
-            
-            for font_name in chinese_fonts:
-                try:
-                    prop = fm.FontProperties(family=font_name)
-                    return prop
-                except:
-                    continue
-            
-            return fm.FontProperties()
-            
-        except Exception as e:
-            print(f"Warning: Could not setup Chinese font: {e}")
-            return fm.FontProperties()
+        """Setup Chinese font for matplotlib (resolved once per process) / 设置中文字体（每个进程只解析一次）"""
+        return _get_chinese_font()
     
-    def generate_from_markdown(self, text: str, layout: str = "left-right") -> Dict[str, Any]:
-        """Generate compact flowchart from Markdown text"""
+    def _graph_cache_key(self, input_type: str, nodes, connections, layout: str) -> str:
+        """
+        Cache key for a parsed graph plus every setting that changes the rendered PNG
+        解析后的图及所有影响PNG输出的渲染设置组成的缓存键
+        """
+        english = self.english_generator
+        return png_cache.make_key(
+            "graph", input_type, nodes, connections, layout, self.current_theme,
+            self.dpi, self.png_compress_level, self.shadow_enabled, self.gradient_enabled, self.border_width,
+            english.dpi, english.png_compress_level,
+        )
+    
+    def generate_from_markdown(self, text: str, layout: str = "left-right", save_to_disk: bool = False) -> Dict[str, Any]:
+        """
+        Generate compact flowchart from Markdown text
+        
+        PNG bytes are returned in memory; a file is only written when save_to_disk is True.
+        PNG字节在内存中返回；仅当save_to_disk为True时才写入文件。
+        """
         try:
-            nodes, connections = self._parse_markdown(text)
+            # Blank input cannot yield nodes, so skip parsing it / 空白输入不会产生节点，跳过解析
+            nodes, connections = self._parse_markdown(text) if text and not text.isspace() else ([], [])
             
             if not nodes:
                 return {
@@ -401,10 +635,18 @@ class OptimizedFlowchartGenerator:
                     "message": "Please provide valid Markdown with numbered or bullet lists"
                 }
             
-            file_path = self._generate_compact_flowchart(nodes, connections, layout, "markdown")
+            # Inputs that parse to the same graph reuse one render / 解析结果相同的输入复用同一渲染结果
+            cache_key = self._graph_cache_key("markdown", nodes, connections, layout)
+            cached = png_cache.get(cache_key)
+            if cached is None:
+                cached = {"png_data": self._generate_compact_flowchart(nodes, connections, layout, "markdown")}
+                png_cache.put(cache_key, cached)
+            png_bytes = cached["png_data"]
+            file_path = self._save_png(png_bytes, "flowchart", "markdown", layout) if save_to_disk else None
             
             return {
                 "success": True,
+                "png_bytes": png_bytes,
                 "file_path": file_path,
                 "nodes_count": len(nodes),
                 "connections_count": len(connections),
@@ -420,10 +662,16 @@ class OptimizedFlowchartGenerator:
                 "message": "Failed to generate flowchart from Markdown"
             }
     
-    def generate_from_mermaid(self, text: str, layout: str = "top-bottom") -> Dict[str, Any]:
-        """Generate compact flowchart from Mermaid syntax with intelligent layout selection"""
+    def generate_from_mermaid(self, text: str, layout: str = "top-bottom", save_to_disk: bool = False) -> Dict[str, Any]:
+        """
+        Generate compact flowchart from Mermaid syntax with intelligent layout selection
+        
+        PNG bytes are returned in memory; a file is only written when save_to_disk is True.
+        PNG字节在内存中返回；仅当save_to_disk为True时才写入文件。
+        """
         try:
-            nodes, connections = self._parse_mermaid(text)
+            # Blank input cannot yield nodes, so skip parsing it / 空白输入不会产生节点，跳过解析
+            nodes, connections = self._parse_mermaid(text) if text and not text.isspace() else ([], [])
             
             if not nodes:
                 return {
@@ -432,41 +680,60 @@ class OptimizedFlowchartGenerator:
                     "message": "Please provide valid Mermaid flowchart syntax"
                 }
             
-            # 智能选择布局算法 - Intelligent layout algorithm selection
-            text_analysis = self._analyze_text_characteristics(nodes)
-            structure_analysis = self._analyze_flowchart_structure(nodes, connections)
+            # Inputs that parse to the same graph reuse one render / 解析结果相同的输入复用同一渲染结果
+            cache_key = self._graph_cache_key("mermaid", nodes, connections, layout)
+            cached = png_cache.get(cache_key)
             
-            # 判断是否使用英文专用布局（但不包括分支场景）
-            use_english_layout = (
-                text_analysis["is_primarily_english"] and  # 主要是英文
-                not structure_analysis['has_branches'] and  # 无分支结构（分支用标准自由布局）
-                (
-                    text_analysis["avg_text_length"] > 20 or  # 平均文本较长
-                    text_analysis["text_complexity"] == "complex"  # 文本复杂
+            if cached is None:
+                # 智能选择布局算法 - Intelligent layout algorithm selection
+                text_analysis = self._analyze_text_characteristics(nodes)
+                structure_analysis = self._analyze_flowchart_structure(nodes, connections)
+                
+                # 判断是否使用英文专用布局（但不包括分支场景）
+                use_english_layout = (
+                    text_analysis["is_primarily_english"] and  # 主要是英文
+                    not structure_analysis['has_branches'] and  # 无分支结构（分支用标准自由布局）
+                    (
+                        text_analysis["avg_text_length"] > 20 or  # 平均文本较长
+                        text_analysis["text_complexity"] == "complex"  # 文本复杂
+                    )
                 )
-            )
-            
-            if use_english_layout:
-                # 使用英文专用布局算法（仅限无分支的复杂英文文本）
-                print(f"[DEBUG] Using English grid layout for complex English text (avg_len: {text_analysis['avg_text_length']:.1f}, no branches)")
-                file_path = self.english_generator.generate_english_flowchart(nodes, connections, layout, "mermaid")
-            else:
-                # 使用标准布局算法（包括英文分支流程图）
-                if structure_analysis['has_branches']:
-                    print(f"[DEBUG] Using standard FREE layout for branching flowchart (english: {text_analysis['is_primarily_english']}, branches: {len(structure_analysis['branch_nodes'])})")
+                
+                if use_english_layout:
+                    # 使用英文专用布局算法（仅限无分支的复杂英文文本）
+                    print(f"[DEBUG] Using English grid layout for complex English text (avg_len: {text_analysis['avg_text_length']:.1f}, no branches)")
+                    png_bytes = self.english_generator.generate_english_flowchart(nodes, connections, layout, "mermaid")
+                    prefix = "english_flowchart"
+                    layout_algorithm = "english_optimized"
                 else:
-                    print(f"[DEBUG] Using standard GRID layout for linear flowchart (english: {text_analysis['is_primarily_english']})")
-                file_path = self._generate_compact_flowchart(nodes, connections, layout, "mermaid")
+                    # 使用标准布局算法（包括英文分支流程图）
+                    if structure_analysis['has_branches']:
+                        print(f"[DEBUG] Using standard FREE layout for branching flowchart (english: {text_analysis['is_primarily_english']}, branches: {len(structure_analysis['branch_nodes'])})")
+                    else:
+                        print(f"[DEBUG] Using standard GRID layout for linear flowchart (english: {text_analysis['is_primarily_english']})")
+                    png_bytes = self._generate_compact_flowchart(nodes, connections, layout, "mermaid", text_analysis, structure_analysis)
+                    prefix = "flowchart"
+                    layout_algorithm = "standard"
+                
+                cached = {"png_data": png_bytes, "prefix": prefix, "layout_algorithm": layout_algorithm}
+                png_cache.put(cache_key, cached)
+            
+            png_bytes = cached["png_data"]
+            prefix = cached["prefix"]
+            
+            # 仅在需要时写入磁盘，工具调用直接使用内存中的PNG
+            file_path = self._save_png(png_bytes, prefix, "mermaid", layout) if save_to_disk else None
             
             return {
                 "success": True,
+                "png_bytes": png_bytes,
                 "file_path": file_path,
                 "nodes_count": len(nodes),
                 "connections_count": len(connections),
                 "layout": layout,
                 "format": "png",
                 "input_type": "mermaid",
-                "layout_algorithm": "english_optimized" if use_english_layout else "standard"
+                "layout_algorithm": cached["layout_algorithm"]
             }
             
         except Exception as e:
@@ -476,165 +743,81 @@ class OptimizedFlowchartGenerator:
                 "message": "Failed to generate flowchart from Mermaid"
             }
     
-    def _parse_markdown(self, text: str) -> Tuple[List[Dict], List[Dict]]:
+    def _parse_markdown(self, text: str) -> Tuple[List[FlowNode], List[FlowEdge]]:
         """Parse Markdown text to extract flow nodes and connections"""
         nodes = []
         connections = []
         
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
         node_id = 0
         prev_node_id = None
+        prev_node_key = None
         
-        for line in lines:
-            if line.startswith('#') or not line:
+        for line in _iter_lines(text):
+            if line.startswith('#'):
                 continue
                 
-            # Extract numbered list items
-            match = re.match(r'^\d+\.\s*(.+)', line)
-            if match:
-                content = match.group(1)
-                node_type = self._determine_node_type(content)
-                
-                nodes.append({
-                    'id': f'node_{node_id}',
-                    'label': content,
-                    'type': node_type
-                })
-                
-                if prev_node_id is not None:
-                    connections.append({
-                        'from': f'node_{prev_node_id}',
-                        'to': f'node_{node_id}',
-                        'label': ''
-                    })
-                
-                prev_node_id = node_id
-                node_id += 1
-                
-            # Handle bullet points
-            elif line.startswith(('-', '*', '+')):
-                content = line[1:].strip()
-                node_type = self._determine_node_type(content)
-                
-                nodes.append({
-                    'id': f'node_{node_id}',
-                    'label': content,
-                    'type': node_type
-                })
-                
-                if prev_node_id is not None:
-                    connections.append({
-                        'from': f'node_{prev_node_id}',
-                        'to': f'node_{node_id}',
-                        'label': ''
-                    })
-                
-                prev_node_id = node_id
-                node_id += 1
+            # Numbered and bullet list items / 编号列表项和项目符号列表项
+            match = _LIST_ITEM_RE.match(line)
+            if not match:
+                continue
+            
+            content = match.group('numbered') or match.group('bullet')
+            node_type = self._determine_node_type(content)
+            # Node key is formatted once and reused as the next edge's source / 节点键只格式化一次，并作为下一条连接的源
+            node_key = f'node_{node_id}'
+            
+            nodes.append(FlowNode(node_key, content, node_type))
+            
+            if prev_node_id is not None:
+                connections.append(FlowEdge(prev_node_key, node_key, '', prev_node_id, node_id))
+            
+            prev_node_id = node_id
+            prev_node_key = node_key
+            node_id += 1
         
         return nodes, connections
     
-    def _parse_mermaid(self, text: str) -> Tuple[List[Dict], List[Dict]]:
+    def _parse_mermaid(self, text: str) -> Tuple[List[FlowNode], List[FlowEdge]]:
         """Parse Mermaid syntax to extract flow nodes and connections"""
         nodes = []
         connections = []
-        node_dict = {}
-        
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        # Node id -> index into nodes, assigned when the node is first seen / 节点ID到节点列表下标的映射，首次出现时分配
+        id_to_idx = {}
         
-        for line in lines:
-            if line.startswith('graph') or line.startswith('flowchart'):
+        for line in _iter_lines(text):
+            if line.startswith(_MERMAID_SKIP_PREFIXES):
                 continue
                 
-            # Enhanced pattern matching for all Mermaid arrow types
-            arrow_patterns = [
-                # 1. 带标签箭头：A -->|标签| B (优先匹配)
-                r'(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?\s*-->\s*\|(.+?)\|\s*(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?',
-                # 2. 带标签箭头：A -- 标签 --> B (支持用户提供的语法)
-                r'(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?\s*--\s*([^-]+?)\s*-->\s*(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?',
-                # 3. 普通箭头：A --> B（源和目标都可能有标签）
-                r'(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?\s*-->\s*(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?',
-                # 4. 简化箭头：A --> B（备用模式）
-                r'(\w+)\s*-->\s*(\w+)(\[.*?\]|\{.*?\}|\(.*?\))?'
-            ]
-            
-            match_found = False
-            for pattern_index, pattern in enumerate(arrow_patterns):
-                arrow_match = re.match(pattern, line)
-                if arrow_match:
-                    match_found = True
-                    groups = arrow_match.groups()
-                    
-                    # 处理不同模式的匹配结果
-                    if pattern_index == 0:  # 带标签箭头模式：A -->|标签| B
-                        if len(groups) >= 5:
-                            from_id = groups[0]
-                            from_label = groups[1] if groups[1] else None
-                            connection_label = groups[2]  # 箭头标签
-                            to_id = groups[3]
-                            to_label = groups[4] if groups[4] else None
-                        else:
-                            continue  # 跳过不合法的匹配
-                    elif pattern_index == 1:  # 带标签箭头模式：A -- 标签 --> B
-                        if len(groups) >= 5:
-                            from_id = groups[0]
-                            from_label = groups[1] if groups[1] else None
-                            connection_label = groups[2].strip()  # 箭头标签，去除空格
-                            to_id = groups[3]
-                            to_label = groups[4] if groups[4] else None
-                        else:
-                            continue  # 跳过不合法的匹配
-                    elif pattern_index == 2:  # 普通箭头模式：A --> B（源和目标都可能有标签）
-                        if len(groups) >= 4:
-                            from_id = groups[0]
-                            from_label = groups[1] if groups[1] else None
-                            to_id = groups[2]
-                            to_label = groups[3] if groups[3] else None
-                            connection_label = ''  # 无标签
-                        else:
-                            continue  # 跳过不合法的匹配
-                    else:  # pattern_index == 3, 简化箭头模式：A --> B
-                        if len(groups) >= 2:
-                            from_id = groups[0]
-                            from_label = None
-                            to_id = groups[1]
-                            to_label = groups[2] if len(groups) > 2 and groups[2] else None
-                            connection_label = ''  # 无标签
-                        else:
-                            continue  # 跳过不合法的匹配
-                    
-                    # Process from node
-                    if from_id not in node_dict:
-                        label = self._extract_mermaid_label(from_label) if from_label else from_id
-                        node_type = self._determine_mermaid_node_type(from_label) if from_label else 'default'
-                        
-                        nodes.append({
-                            'id': from_id,
-                            'label': label,
-                            'type': node_type
-                        })
-                        node_dict[from_id] = True
+            arrow_match = _MERMAID_EDGE_RE.match(line)
+            if arrow_match:
+                from_id = arrow_match.group('from_id')
+                from_label = arrow_match.group('from_shape')
+                to_id = arrow_match.group('to_id')
+                to_label = arrow_match.group('to_shape')
+                
+                # 箭头标签：|标签| 原样保留，-- 标签 --> 去除首尾空格
+                connection_label = arrow_match.group('pipe_label')
+                if connection_label is None:
+                    connection_label = (arrow_match.group('dash_label') or '').strip()
+                
+                # Process from node
+                if from_id not in id_to_idx:
+                    label = self._extract_mermaid_label(from_label) if from_label else from_id
+                    node_type = self._determine_mermaid_node_type(from_label) if from_label else 'default'
                     
-                    # Process to node
-                    if to_id not in node_dict:
-                        label = self._extract_mermaid_label(to_label) if to_label else to_id
-                        node_type = self._determine_mermaid_node_type(to_label) if to_label else 'default'
-                        
-                        nodes.append({
-                            'id': to_id,
-                            'label': label,
-                            'type': node_type
-                        })
-                        node_dict[to_id] = True
+                    id_to_idx[from_id] = len(nodes)
+                    nodes.append(FlowNode(from_id, label, node_type))
+                
+                # Process to node
+                if to_id not in id_to_idx:
+                    label = self._extract_mermaid_label(to_label) if to_label else to_id
+                    node_type = self._determine_mermaid_node_type(to_label) if to_label else 'default'
                     
-                    # Add connection
-                    connections.append({
-                        'from': from_id,
-                        'to': to_id,
-                        'label': connection_label or ''
-                    })
-                    break
+                    id_to_idx[to_id] = len(nodes)
+                    nodes.append(FlowNode(to_id, label, node_type))
+                
+                # Add connection
+                connections.append(FlowEdge(from_id, to_id, connection_label or '', id_to_idx[from_id], id_to_idx[to_id]))
         
         return nodes, connections
     
@@ -642,13 +825,13 @@ class OptimizedFlowchartGenerator:
         """Determine node type based on content"""
         content_lower = content.lower()
         
-        if any(word in content_lower for word in ['start', 'begin', '开始', '启动']):
+        if _START_KEYWORDS_RE.search(content_lower):
             return 'start'
-        elif any(word in content_lower for word in ['end', 'finish', 'complete', '结束', '完成']):
+        elif _END_KEYWORDS_RE.search(content_lower):
             return 'end'
-        elif any(word in content_lower for word in ['?', 'if', 'decide', 'choice', '判断', '选择', '决策', '是否']):
+        elif _DECISION_KEYWORDS_RE.search(content_lower):
             return 'decision'
-        elif any(word in content_lower for word in ['process', 'handle', 'execute', '处理', '执行']):
+        elif _PROCESS_KEYWORDS_RE.search(content_lower):
             return 'process'
         else:
             return 'default'
@@ -658,119 +841,61 @@ class OptimizedFlowchartGenerator:
         if not shape:
             return 'default'
         
-        content = self._extract_mermaid_label(shape).lower()
+        node_type = _MERMAID_SHAPE_TYPES.get((shape[0], shape[-1]), 'default')
         
-        if shape.startswith('[') and shape.endswith(']'):
-            if any(word in content for word in ['start', 'begin', '开始', '启动']):
+        # Only rectangles are refined by their label / 仅矩形节点根据标签细分类型
+        if node_type == 'process':
+            content = self._extract_mermaid_label(shape).lower()
+            if _START_KEYWORDS_RE.search(content):
                 return 'start'
-            elif any(word in content for word in ['end', 'finish', 'complete', '结束', '完成']):
+            elif _END_KEYWORDS_RE.search(content):
                 return 'end'
-            else:
-                return 'process'
-        elif shape.startswith('{') and shape.endswith('}'):
-            return 'decision'
-        elif shape.startswith('(') and shape.endswith(')'):
-            return 'start'
-        else:
-            return 'default'
+        return node_type
     
     def _extract_mermaid_label(self, shape: str) -> str:
         """Extract label from Mermaid node shape"""
         if not shape:
             return ''
-        return re.sub(r'^[\[\{\(]|[\]\}\)]$', '', shape)
+        # Drop at most one opening and one closing bracket, each independently / 首尾各最多去掉一个括号，互不依赖
+        start = 1 if shape[0] in _MERMAID_OPENING_BRACKETS else 0
+        end = len(shape) - 1 if shape[-1] in _MERMAID_CLOSING_BRACKETS else len(shape)
+        return shape[start:end]
     
-    def _analyze_flowchart_structure(self, nodes: List[Dict], connections: List[Dict]) -> Dict[str, Any]:
+    def _analyze_flowchart_structure(self, nodes: List[FlowNode], connections: List[FlowEdge]) -> Dict[str, Any]:
         """
         Analyze flowchart structure to detect branches and decision points
         分析流程图结构以检测分支和决策点
         """
-        # Build connection graph / 构建连接图
-        outgoing_connections = {}
-        incoming_connections = {}
-        
-        for connection in connections:
-            from_id = connection['from']
-            to_id = connection['to']
-            
-            # Track outgoing connections / 跟踪出向连接
-            if from_id not in outgoing_connections:
-                outgoing_connections[from_id] = []
-            outgoing_connections[from_id].append(connection)
-            
-            # Track incoming connections / 跟踪入向连接
-            if to_id not in incoming_connections:
-                incoming_connections[to_id] = []
-            incoming_connections[to_id].append(connection)
-        
-        # Detect branch nodes (nodes with multiple outgoing connections) / 检测分支节点（有多个出向连接的节点）
-        branch_nodes = []
-        decision_nodes = []
-        
-        for node in nodes:
-            node_id = node['id']
-            outgoing_count = len(outgoing_connections.get(node_id, []))
-            
-            # Node with multiple outgoing connections is a branch point / 有多个出向连接的节点是分支点
-            if outgoing_count > 1:
-                branch_nodes.append(node_id)
-                
-                # Check if it's explicitly a decision node / 检查是否明确是决策节点
-                if node.get('type') == 'decision' or '{' in node.get('label', ''):
-                    decision_nodes.append(node_id)
-        
-        # Detect merge nodes (nodes with multiple incoming connections) / 检测合并节点（有多个入向连接的节点）
-        merge_nodes = []
-        for node in nodes:
-            node_id = node['id']
-            incoming_count = len(incoming_connections.get(node_id, []))
-            if incoming_count > 1:
-                merge_nodes.append(node_id)
-        
-        # Calculate branching complexity / 计算分支复杂度
-        max_branches = max([len(outgoing_connections.get(node['id'], [])) for node in nodes], default=0)
-        total_branches = sum([max(0, len(outgoing_connections.get(node['id'], [])) - 1) for node in nodes])
-        
-        has_branches = len(branch_nodes) > 0
-        has_complex_branches = max_branches > 2 or total_branches > 2
-        
-        return {
-            'has_branches': has_branches,
-            'has_complex_branches': has_complex_branches,
-            'branch_nodes': branch_nodes,
-            'decision_nodes': decision_nodes,
-            'merge_nodes': merge_nodes,
-            'max_branches': max_branches,
-            'total_branches': total_branches,
-            'outgoing_connections': outgoing_connections,
-            'incoming_connections': incoming_connections
-        }
+        return analyze_flowchart_structure(nodes, connections)
     
-    def _analyze_text_characteristics(self, nodes: List[Dict]) -> Dict[str, Any]:
+    def _analyze_text_characteristics(self, nodes: List[FlowNode]) -> Dict[str, Any]:
         """
         分析文本特征，包括英文文本的特殊处理
         Analyze text characteristics with special handling for English text
         """
         # Calculate text lengths / 计算文本长度
-        text_lengths = []
+        # Count characters, treating Chinese characters properly / 正确计算中文字符
+        lengths = np.fromiter((len(node.label) for node in nodes), dtype=np.int64, count=len(nodes))
+        text_lengths = lengths.tolist()
         english_node_count = 0
         total_english_chars = 0
         
-        for node in nodes:
-            label = node.get('label', '')
-            # Count characters, treating Chinese characters properly / 正确计算中文字符
-            length = len(label)
-            text_lengths.append(length)
-            
+        for node, length in zip(nodes, text_lengths):
             # 检测英文文本（包含字母和空格的比例）
-            english_chars = sum(1 for c in label if c.isalpha() and ord(c) < 128 or c.isspace())
-            if english_chars / max(1, len(label)) > 0.6:  # 60%以上是英文字符
+            english_chars = sum(1 for c in node.label if c.isalpha() and ord(c) < 128 or c.isspace())
+            if english_chars / max(1, length) > 0.6:  # 60%以上是英文字符
                 english_node_count += 1
                 total_english_chars += english_chars
         
-        avg_length = sum(text_lengths) / len(text_lengths) if text_lengths else 0
-        max_length = max(text_lengths) if text_lengths else 0
-        min_length = min(text_lengths) if text_lengths else 0
+        # Length statistics as NumPy reductions / 使用NumPy归约计算长度统计
+        if len(lengths):
+            avg_length = float(lengths.mean())
+            max_length = int(lengths.max())
+            min_length = int(lengths.min())
+        else:
+            avg_length = 0
+            max_length = 0
+            min_length = 0
         
         # 英文文本特征分析
         is_primarily_english = english_node_count / len(nodes) > 0.5 if nodes else False
@@ -793,13 +918,10 @@ class OptimizedFlowchartGenerator:
             complexity = "complex"
         
         # Check for long text nodes / 检查长文本节点
-        has_long_text = any(length > medium_threshold for length in text_lengths)
+        has_long_text = bool((lengths > medium_threshold).any())
         
         # Analyze text distribution / 分析文本分布
-        if len(text_lengths) > 0:
-            length_variance = sum((l - avg_length) ** 2 for l in text_lengths) / len(text_lengths)
-        else:
-            length_variance = 0
+        length_variance = float(lengths.var()) if len(lengths) else 0
             
         if length_variance < 2:
             distribution = "uniform"
@@ -822,12 +944,12 @@ class OptimizedFlowchartGenerator:
             "avg_english_length": avg_english_length
         }
     
-    def _get_node_dimensions(self, node: Dict) -> Tuple[float, float]:
+    def _get_node_dimensions(self, node: FlowNode) -> Tuple[float, float]:
         """
         根据节点内容获取动态节点尺寸
         Get dynamic node dimensions based on node content
         """
-        label = node.get('label', '')
+        label = node.label
         
         # 检测是否为英文文本
         english_chars = sum(1 for c in label if c.isalpha() and ord(c) < 128 or c.isspace())
@@ -888,38 +1010,27 @@ class OptimizedFlowchartGenerator:
         
         return dynamic_h_spacing, dynamic_v_spacing
     
-    def _calculate_adaptive_grid(self, nodes: List[Dict], layout: str) -> Tuple[int, int]:
+    def _calculate_adaptive_grid(self, nodes: List[FlowNode], layout: str, text_analysis: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
         """Calculate adaptive grid dimensions based on content analysis / 基于内容分析计算自适应网格尺寸"""
         node_count = len(nodes)
         if node_count == 0:
             return 1, 1
             
-        text_analysis = self._analyze_text_characteristics(nodes)
+        if text_analysis is None:
+            text_analysis = self._analyze_text_characteristics(nodes)
+        
+        # 复杂或长文本需要更宽松的网格
+        dense_text = text_analysis["text_complexity"] == "complex" or text_analysis["has_long_text"]
         
         if layout == "left-right":
             # 水平布局：优先横向排列，减少行数
-            if node_count <= 6:
-                # 少量节点：单行排列
-                cols = node_count
-                rows = 1
-            elif node_count <= 12:
-                # 中等节点：2行排列
-                cols = (node_count + 1) // 2
-                rows = 2
-            elif node_count <= 18:
-                # 较多节点：3行排列
-                cols = (node_count + 2) // 3
-                rows = 3
-            else:
-                # 大量节点：4行排列
-                cols = (node_count + 3) // 4
-                rows = 4
+            # 每6个节点增加一行，最多4行（≤6单行，≤12两行，≤18三行，其余四行）
+            rows = min(4, (node_count - 1) // 6 + 1)
+            cols = (node_count + rows - 1) // rows
             
             # 根据文本复杂度调整：复杂文本减少每行列数
-            if text_analysis["text_complexity"] == "complex" or text_analysis["has_long_text"]:
-                if cols > 4:
-                    cols = max(4, cols - 1)
-                    rows = max(1, (node_count + cols - 1) // cols)
+            if dense_text and cols > 4:
+                cols = max(4, cols - 1)
             
             # 确保网格尺寸合理
             cols = max(1, min(cols, node_count))
@@ -927,28 +1038,14 @@ class OptimizedFlowchartGenerator:
             
         else:  # top-bottom
             # 垂直布局：优先纵向排列，减少列数
-            if node_count <= 8:
-                # 少量节点：单列排列
-                cols = 1
-                rows = node_count
-            elif node_count <= 16:
-                # 中等节点：2列排列
-                cols = 2
-                rows = (node_count + 1) // 2
-            elif node_count <= 24:
-                # 较多节点：3列排列
-                cols = 3
-                rows = (node_count + 2) // 3
-            else:
-                # 大量节点：4列排列
-                cols = 4
-                rows = (node_count + 3) // 4
+            # 每8个节点增加一列，最多4列（≤8单列，≤16两列，≤24三列，其余四列）
+            cols = min(4, (node_count - 1) // 8 + 1)
+            rows = (node_count + cols - 1) // cols
             
             # 根据文本复杂度调整：复杂文本减少每列行数
-            if text_analysis["text_complexity"] == "complex" or text_analysis["has_long_text"]:
-                if rows > 6:
-                    rows = max(6, rows - 1)
-                    cols = max(1, (node_count + rows - 1) // rows)
+            if dense_text and rows > 6:
+                rows = max(6, rows - 1)
+                cols = max(1, (node_count + rows - 1) // rows)
             
             # 确保网格尺寸合理
             cols = max(1, min(cols, node_count))
@@ -956,9 +1053,10 @@ class OptimizedFlowchartGenerator:
         
         return rows, cols
     
-    def _calculate_adaptive_canvas_size(self, nodes: List[Dict], layout: str, rows: int, cols: int) -> Tuple[float, float]:
+    def _calculate_adaptive_canvas_size(self, nodes: List[FlowNode], layout: str, rows: int, cols: int, text_analysis: Optional[Dict[str, Any]] = None) -> Tuple[float, float]:
         """Calculate adaptive canvas size based on content analysis / 基于内容分析计算自适应画布尺寸"""
-        text_analysis = self._analyze_text_characteristics(nodes)
+        if text_analysis is None:
+            text_analysis = self._analyze_text_characteristics(nodes)
         node_count = len(nodes)
         
         # 使用动态间距计算
@@ -1021,134 +1119,43 @@ class OptimizedFlowchartGenerator:
         
         return canvas_width, canvas_height
     
-    def _calculate_adaptive_positions(self, nodes: List[Dict], layout: str, canvas_width: float, canvas_height: float, rows: int, cols: int) -> Dict[str, Tuple[float, float]]:
-        """Calculate adaptive node positions with content-aware spacing / 计算内容感知的自适应节点位置"""
-        positions = {}
-        node_count = len(nodes)
-        text_analysis = self._analyze_text_characteristics(nodes)
-        
-        # Get adaptive spacing / 获取自适应间距
-        base_h_spacing = self.horizontal_spacing
-        base_v_spacing = self.vertical_spacing
-        
-        # Adjust spacing based on content / 根据内容调整间距
-        if text_analysis["text_complexity"] == "complex":
-            h_spacing_factor = 1.2
-            v_spacing_factor = 1.3
-        elif text_analysis["text_complexity"] == "simple":
-            h_spacing_factor = 0.9
-            v_spacing_factor = 0.9
-        else:
-            h_spacing_factor = 1.0
-            v_spacing_factor = 1.0
-        
-        if text_analysis["has_long_text"]:
-            h_spacing_factor *= 1.15
-            v_spacing_factor *= 1.1
-        
-        if layout == "left-right":
-            # 水平布局：优先横向排列，确保间距均匀
-            available_width = canvas_width - 2 * self.margin_x
-            available_height = canvas_height - 2 * self.margin_y
-            
-            # 计算节点间的实际间距，去除间距因子的干扰
-            if cols > 1:
-                # 计算每个节点占用的总宽度（包括节点和间距）
-                total_node_width = cols * self.node_width
-                remaining_width = available_width - total_node_width
-                x_spacing_gap = remaining_width / (cols - 1) if cols > 1 else 0  # 节点间纯间距
-                x_spacing = self.node_width + x_spacing_gap  # 节点中心到中心的距离
-            else:
-                x_spacing = available_width
-                
-            if rows > 1:
-                # 计算每个节点占用的总高度（包括节点和间距）
-                total_node_height = rows * self.node_height
-                remaining_height = available_height - total_node_height
-                y_spacing_gap = remaining_height / (rows - 1) if rows > 1 else 0  # 节点间纯间距
-                y_spacing = self.node_height + y_spacing_gap  # 节点中心到中心的距离
-            else:
-                y_spacing = available_height
-            
-            # 确保最小间距，防止节点重叠
-            min_x_spacing = self.node_width + 0.8  # 最小水平间距
-            min_y_spacing = self.node_height + 0.8  # 最小垂直间距
-            x_spacing = max(x_spacing, min_x_spacing)
-            y_spacing = max(y_spacing, min_y_spacing)
-            
-            # 按行优先的顺序计算节点位置
-            for i, node in enumerate(nodes):
-                row = i // cols  # 当前行号（从0开始）
-                col = i % cols   # 当前列号（从0开始）
-                
-                # 计算节点中心位置
-                x = self.margin_x + self.node_width/2 + col * x_spacing
-                y = canvas_height - self.margin_y - self.node_height/2 - row * y_spacing
-                
-                # 边界安全检查：确保节点不会超出画布边界
-                x = max(self.margin_x + self.node_width/2, 
-                       min(canvas_width - self.margin_x - self.node_width/2, x))
-                y = max(self.margin_y + self.node_height/2, 
-                       min(canvas_height - self.margin_y - self.node_height/2, y))
-                
-                positions[node['id']] = (x, y)
+    def _save_png(self, png_bytes: bytes, prefix: str, input_type: str, layout: str) -> str:
+        """
+        Save rendered PNG bytes to the output directory
+        将渲染好的PNG字节保存到输出目录
+        """
+        # Generate unique filename: nanosecond timestamp plus a process-wide sequence number,
+        # so renders within the same second never overwrite each other
+        # 生成唯一文件名：纳秒时间戳加进程内序号，同一秒内的多次渲染不会互相覆盖
+        layout_suffix = "lr" if layout == "left-right" else "tb"
+        filename = f"{prefix}_{input_type}_{layout_suffix}_{time.time_ns():x}_{next(_SAVE_SEQUENCE)}.png"
+        file_path = os.path.join(self.output_dir, filename)
         
-        else:  # top-bottom
-            # 垂直布局：优先纵向排列，确保间距均匀
-            available_width = canvas_width - 2 * self.margin_x
-            available_height = canvas_height - 2 * self.margin_y
-            
-            # 计算节点间的实际间距，去除间距因子的干扰
-            if cols > 1:
-                # 计算每个节点占用的总宽度（包括节点和间距）
-                total_node_width = cols * self.node_width
-                remaining_width = available_width - total_node_width
-                x_spacing_gap = remaining_width / (cols - 1) if cols > 1 else 0  # 节点间纯间距
-                x_spacing = self.node_width + x_spacing_gap  # 节点中心到中心的距离
-            else:
-                x_spacing = available_width
-                
-            if rows > 1:
-                # 计算每个节点占用的总高度（包括节点和间距）
-                total_node_height = rows * self.node_height
-                remaining_height = available_height - total_node_height
-                y_spacing_gap = remaining_height / (rows - 1) if rows > 1 else 0  # 节点间纯间距
-                y_spacing = self.node_height + y_spacing_gap  # 节点中心到中心的距离
-            else:
-                y_spacing = available_height
-            
-            # 确保最小间距，防止节点重叠
-            min_x_spacing = self.node_width + 0.8  # 最小水平间距
-            min_y_spacing = self.node_height + 0.8  # 最小垂直间距
-            x_spacing = max(x_spacing, min_x_spacing)
-            y_spacing = max(y_spacing, min_y_spacing)
-            
-            # 按列优先的顺序计算节点位置
-            for i, node in enumerate(nodes):
-                col = i // rows  # 当前列号（从0开始）
-                row = i % rows   # 当前行号（从0开始）
-                
-                # 计算节点中心位置
-                x = self.margin_x + self.node_width/2 + col * x_spacing
-                y = canvas_height - self.margin_y - self.node_height/2 - row * y_spacing
-                
-                # 边界安全检查：确保节点不会超出画布边界
-                x = max(self.margin_x + self.node_width/2, 
-                       min(canvas_width - self.margin_x - self.node_width/2, x))
-                y = max(self.margin_y + self.node_height/2, 
-                       min(canvas_height - self.margin_y - self.node_height/2, y))
-                
-                positions[node['id']] = (x, y)
+        try:
+            f = open(file_path, "wb")
+        except FileNotFoundError:
+            # Create the output directory only when it is missing / 仅在输出目录不存在时创建
+            os.makedirs(self.output_dir, exist_ok=True)
+            f = open(file_path, "wb")
+        with f:
+            f.write(png_bytes)
         
-        return positions
+        return file_path
     
-    def _generate_compact_flowchart(self, nodes: List[Dict], connections: List[Dict], layout: str, input_type: str) -> str:
-        """Generate compact flowchart with optimized space usage and save as PNG file"""
+    def _generate_compact_flowchart(self, nodes: List[FlowNode], connections: List[FlowEdge], layout: str, input_type: str, text_analysis: Optional[Dict[str, Any]] = None,
+                                    structure_analysis: Optional[Dict[str, Any]] = None) -> bytes:
+        """Generate compact flowchart with optimized space usage and return PNG bytes"""
         if not nodes:
             raise ValueError("No nodes to generate flowchart")
         
+        # Text and structure analyses are computed once and shared by grid, canvas, position and connection calculation
+        # 文本和结构分析只计算一次，供网格、画布、位置和连接计算共用
+        if text_analysis is None:
+            text_analysis = self._analyze_text_characteristics(nodes)
+        if structure_analysis is None:
+            structure_analysis = self._analyze_flowchart_structure(nodes, connections)
+        
         # Calculate adaptive grid dimensions and canvas size based on structure / 根据结构计算自适应网格尺寸和画布大小
-        structure_analysis = self._analyze_flowchart_structure(nodes, connections)
         
         if structure_analysis['has_branches']:
             # 分支场景使用紧凑但防重叠的画布尺寸
@@ -1191,145 +1198,60 @@ class OptimizedFlowchartGenerator:
             rows, cols = 1, 1  # 自由布局不使用网格
         else:
             # For linear scenarios, use normal grid calculation / 线性场景使用正常网格计算
-            rows, cols = self._calculate_adaptive_grid(nodes, layout)
-            canvas_width, canvas_height = self._calculate_adaptive_canvas_size(nodes, layout, rows, cols)
+            rows, cols = self._calculate_adaptive_grid(nodes, layout, text_analysis)
+            canvas_width, canvas_height = self._calculate_adaptive_canvas_size(nodes, layout, rows, cols, text_analysis)
         
-        # Create figure with dynamic size and theme support / 创建带主题支持的动态尺寸图形
+        # Reuse the persistent figure with dynamic size and theme support / 复用持久图形，支持动态尺寸和主题
         theme = self.get_current_theme()
-        fig, ax = plt.subplots(figsize=(canvas_width, canvas_height))
-        fig.patch.set_facecolor(theme['background'])  # Set background color / 设置背景颜色
-        ax.set_xlim(0, canvas_width)
-        ax.set_ylim(0, canvas_height)
-        ax.axis('off')
-        ax.set_facecolor(theme['background'])  # Set axes background / 设置坐标轴背景
-        
-        # Calculate adaptive positions using structure-aware layout / 使用结构感知布局计算自适应位置
-        structure_analysis = self._analyze_flowchart_structure(nodes, connections)
-        if structure_analysis['has_branches']:
-            # Use free layout for branching scenarios / 分支场景使用自由布局
-            print(f"[DEBUG] Using FREE LAYOUT for branching flowchart (branches: {len(structure_analysis['branch_nodes'])})")
-            positions = self._calculate_free_layout_positions(nodes, connections, layout, canvas_width, canvas_height)
-        else:
-            # Use grid layout with L-turn connections for linear scenarios / 线性场景使用网格布局+L转弯连接
-            print(f"[DEBUG] Using GRID LAYOUT with L-turn connections for linear flowchart")
-            positions = self._calculate_branch_aware_positions(nodes, connections, layout, canvas_width, canvas_height, rows, cols)
-        
-        # Draw nodes / 绘制节点
-        for node in nodes:
-            self._draw_compact_node(ax, node, positions[node['id']])
-        
-        # Draw intelligent connections / 绘制智能连接
-        for connection in connections:
-            self._draw_intelligent_connection(ax, connection, positions, layout, nodes, connections)
-        
-        # Generate unique filename / 生成唯一文件名
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        layout_suffix = "lr" if layout == "left-right" else "tb"
-        filename = f"flowchart_{input_type}_{layout_suffix}_{timestamp}.png"
-        file_path = os.path.join(self.output_dir, filename)
-        
-        # Save as PNG file with theme background / 保存为带主题背景的PNG文件
-        plt.savefig(file_path, format='png', dpi=300, bbox_inches='tight', 
-                   facecolor=theme['background'], edgecolor='none', pad_inches=0.1)
-        plt.close(fig)
-        
-        return file_path
-    
-    def _calculate_intelligent_positions(self, nodes: List[Dict], layout: str, canvas_width: float, canvas_height: float, rows: int, cols: int) -> Dict[str, Tuple[float, float]]:
-        """Calculate intelligent multi-row/column positions to maximize space utilization / 计算智能多行多列位置以最大化空间利用"""
-        positions = {}
-        node_count = len(nodes)
-        
-        if layout == "left-right":
-            # 水平布局：优先横向排列，确保间距均匀
-            available_width = canvas_width - 2 * self.margin_x
-            available_height = canvas_height - 2 * self.margin_y
-            
-            # 计算节点间的实际间距
-            if cols > 1:
-                total_node_width = cols * self.node_width
-                remaining_width = available_width - total_node_width
-                x_spacing_gap = remaining_width / (cols - 1) if cols > 1 else 0
-                x_spacing = self.node_width + x_spacing_gap
+        with self._render_lock:
+            fig = self._fig
+            ax = self._ax
+            # Clearing the axes drops the previous render's artists / 清空坐标轴以释放上一次渲染的图元
+            ax.clear()
+            fig.set_size_inches(canvas_width, canvas_height)
+            fig.patch.set_facecolor(theme['background'])  # Set background color / 设置背景颜色
+            ax.set_xlim(0, canvas_width)
+            ax.set_ylim(0, canvas_height)
+            ax.axis('off')
+            ax.set_facecolor(theme['background'])  # Set axes background / 设置坐标轴背景
+            
+            # Calculate adaptive positions using structure-aware layout / 使用结构感知布局计算自适应位置
+            if structure_analysis['has_branches']:
+                # Use free layout for branching scenarios / 分支场景使用自由布局
+                print(f"[DEBUG] Using FREE LAYOUT for branching flowchart (branches: {len(structure_analysis['branch_nodes'])})")
+                positions = self._calculate_free_layout_positions(nodes, connections, layout, canvas_width, canvas_height, structure_analysis)
             else:
-                x_spacing = available_width
-                
-            if rows > 1:
-                total_node_height = rows * self.node_height
-                remaining_height = available_height - total_node_height
-                y_spacing_gap = remaining_height / (rows - 1) if rows > 1 else 0
-                y_spacing = self.node_height + y_spacing_gap
-            else:
-                y_spacing = available_height
+                # Use grid layout with L-turn connections for linear scenarios / 线性场景使用网格布局+L转弯连接
+                print(f"[DEBUG] Using GRID LAYOUT with L-turn connections for linear flowchart")
+                positions = self._calculate_branch_aware_positions(nodes, connections, layout, canvas_width, canvas_height, rows, cols, text_analysis, structure_analysis)
             
-            # 确保最小间距
-            min_x_spacing = self.node_width + 0.8
-            min_y_spacing = self.node_height + 0.8
-            x_spacing = max(x_spacing, min_x_spacing)
-            y_spacing = max(y_spacing, min_y_spacing)
-            
-            # 按行优先计算节点位置
-            for i, node in enumerate(nodes):
-                row = i // cols  # 当前行
-                col = i % cols   # 当前列
-                
-                # 计算位置
-                x = self.margin_x + self.node_width/2 + col * x_spacing
-                y = canvas_height - self.margin_y - self.node_height/2 - row * y_spacing
-                
-                positions[node['id']] = (x, y)
-        
-        else:  # top-bottom
-            # 垂直布局：优先纵向排列，确保间距均匀
-            available_width = canvas_width - 2 * self.margin_x
-            available_height = canvas_height - 2 * self.margin_y
+            # Node coordinates as an (N, 2) array in node order / 按节点顺序排列的(N, 2)坐标数组
+            graph = build_graph_arrays(nodes, connections)
+            xy = np.array([positions[node_id] for node_id in graph.ids], dtype=float)
             
-            # 计算节点间的实际间距
-            if cols > 1:
-                total_node_width = cols * self.node_width
-                remaining_width = available_width - total_node_width
-                x_spacing_gap = remaining_width / (cols - 1) if cols > 1 else 0
-                x_spacing = self.node_width + x_spacing_gap
-            else:
-                x_spacing = available_width
-                
-            if rows > 1:
-                total_node_height = rows * self.node_height
-                remaining_height = available_height - total_node_height
-                y_spacing_gap = remaining_height / (rows - 1) if rows > 1 else 0
-                y_spacing = self.node_height + y_spacing_gap
-            else:
-                y_spacing = available_height
+            # Draw nodes / 绘制节点
+            self._draw_compact_nodes(ax, nodes, xy, theme)
             
-            # 确保最小间距
-            min_x_spacing = self.node_width + 0.8
-            min_y_spacing = self.node_height + 0.8
-            x_spacing = max(x_spacing, min_x_spacing)
-            y_spacing = max(y_spacing, min_y_spacing)
+            # Draw intelligent connections as batched collections / 以批量集合绘制智能连接
+            self._draw_intelligent_connections(ax, graph, xy, layout, structure_analysis, theme)
             
-            # 按列优先计算节点位置
-            for i, node in enumerate(nodes):
-                col = i // rows  # 当前列
-                row = i % rows   # 当前行
-                
-                # 计算位置
-                x = self.margin_x + self.node_width/2 + col * x_spacing
-                y = canvas_height - self.margin_y - self.node_height/2 - row * y_spacing
-                
-                positions[node['id']] = (x, y)
+            # Render PNG in memory with theme background / 在内存中渲染带主题背景的PNG
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', dpi=self.dpi, bbox_inches='tight', 
+                        facecolor=theme['background'], edgecolor='none', pad_inches=0.1,
+                        pil_kwargs={'compress_level': self.png_compress_level})
         
-        return positions
+        return buffer.getvalue()
     
-    def _calculate_branch_aware_positions(self, nodes: List[Dict], connections: List[Dict], layout: str, canvas_width: float, canvas_height: float, rows: int, cols: int) -> Dict[str, Tuple[float, float]]:
+    def _calculate_branch_aware_positions(self, nodes: List[FlowNode], connections: List[FlowEdge], layout: str, canvas_width: float, canvas_height: float, rows: int, cols: int, text_analysis: Optional[Dict[str, Any]] = None,
+                                          structure_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[float, float]]:
         """Calculate branch-aware node positions to prevent overlap in branching scenarios / 计算分支感知的节点位置以防止分支场景中的重叠"""
         positions = {}
         node_count = len(nodes)
-        text_analysis = self._analyze_text_characteristics(nodes)
-        structure_analysis = self._analyze_flowchart_structure(nodes, connections)
-        
-        # Get adaptive spacing / 获取自适应间距
-        base_h_spacing = self.horizontal_spacing
-        base_v_spacing = self.vertical_spacing
+        if text_analysis is None:
+            text_analysis = self._analyze_text_characteristics(nodes)
+        if structure_analysis is None:
+            structure_analysis = self._analyze_flowchart_structure(nodes, connections)
         
         # Adjust spacing based on content / 根据内容调整间距
         if text_analysis["text_complexity"] == "complex":
@@ -1384,7 +1306,7 @@ class OptimizedFlowchartGenerator:
                        min(canvas_height - self.margin_y - self.node_height/2, y))
                 
                 # Fine-tune position for branch nodes / 为分支节点微调位置
-                node_id = node['id']
+                node_id = node.id
                 if node_id in structure_analysis['branch_nodes']:
                     # Give branch nodes extra horizontal space / 为分支节点提供额外水平空间
                     x += x_spacing * 0.1
@@ -1393,13 +1315,13 @@ class OptimizedFlowchartGenerator:
                     x -= x_spacing * 0.1
                 
                 # Fine-tune position based on text length / 根据文本长度微调位置
-                text_length = len(node.get('label', ''))
+                text_length = len(node.label)
                 if text_length > text_analysis["avg_text_length"] * 1.5:
                     # Give more space to long text nodes / 为长文本节点提供更多空间
                     if col < cols - 1:  # Not the last column
                         x += x_spacing * 0.1
                 
-                positions[node['id']] = (x, y)
+                positions[node.id] = (x, y)
         
         else:  # top-bottom
             # Branch-aware multi-column vertical layout / 分支感知多列垂直布局
@@ -1433,7 +1355,7 @@ class OptimizedFlowchartGenerator:
                        min(canvas_height - self.margin_y - self.node_height/2, y))
                 
                 # Fine-tune position for branch nodes / 为分支节点微调位置
-                node_id = node['id']
+                node_id = node.id
                 if node_id in structure_analysis['branch_nodes']:
                     # Give branch nodes extra vertical space / 为分支节点提供额外垂直空间
                     y += y_spacing * 0.1
@@ -1442,7 +1364,7 @@ class OptimizedFlowchartGenerator:
                     y -= y_spacing * 0.1
                 
                 # Fine-tune position based on text length / 根据文本长度微调位置
-                text_length = len(node.get('label', ''))
+                text_length = len(node.label)
                 if text_length > text_analysis["avg_text_length"] * 1.5:
                     # Give more space to long text nodes / 为长文本节点提供更多空间
                     if row < rows - 1:  # Not the last row
@@ -1454,14 +1376,16 @@ class OptimizedFlowchartGenerator:
                 y = max(self.margin_y + self.node_height/2, 
                        min(canvas_height - self.margin_y - self.node_height/2, y))
                 
-                positions[node['id']] = (x, y)
+                positions[node.id] = (x, y)
         
         return positions
     
-    def _calculate_free_layout_positions(self, nodes: List[Dict], connections: List[Dict], layout: str, canvas_width: float, canvas_height: float) -> Dict[str, Tuple[float, float]]:
+    def _calculate_free_layout_positions(self, nodes: List[FlowNode], connections: List[FlowEdge], layout: str, canvas_width: float, canvas_height: float,
+                                         structure_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[float, float]]:
         """Calculate free layout positions for branching flowcharts / 计算分支流程图的自由布局位置"""
         positions = {}
-        structure_analysis = self._analyze_flowchart_structure(nodes, connections)
+        if structure_analysis is None:
+            structure_analysis = self._analyze_flowchart_structure(nodes, connections)
         
         # Build node hierarchy based on connections / 根据连接构建节点层次结构
         node_levels = self._build_node_hierarchy(nodes, connections)
@@ -1517,7 +1441,7 @@ class OptimizedFlowchartGenerator:
         
         return positions
     
-    def _build_node_hierarchy(self, nodes: List[Dict], connections: List[Dict]) -> Dict[str, int]:
+    def _build_node_hierarchy(self, nodes: List[FlowNode], connections: List[FlowEdge]) -> Dict[str, int]:
         """Build node hierarchy levels based on flow connections / 根据流连接构建节点层次级别"""
         node_levels = {}
         
@@ -1526,22 +1450,22 @@ class OptimizedFlowchartGenerator:
         outgoing_map = {}
         
         for node in nodes:
-            incoming_counts[node['id']] = 0
-            outgoing_map[node['id']] = []
+            incoming_counts[node.id] = 0
+            outgoing_map[node.id] = []
         
         for conn in connections:
-            incoming_counts[conn['to']] += 1
-            outgoing_map[conn['from']].append(conn['to'])
+            incoming_counts[conn.target] += 1
+            outgoing_map[conn.source].append(conn.target)
         
         # Start nodes have no incoming connections / 起始节点没有入向连接
         start_nodes = [node_id for node_id, count in incoming_counts.items() if count == 0]
         
         # BFS to assign levels / 使用BFS分配层级
-        queue = [(node_id, 0) for node_id in start_nodes]
+        queue = deque((node_id, 0) for node_id in start_nodes)
         visited = set()
         
         while queue:
-            node_id, level = queue.pop(0)
+            node_id, level = queue.popleft()
             
             if node_id in visited:
                 continue
@@ -1556,8 +1480,8 @@ class OptimizedFlowchartGenerator:
         
         # Handle any unconnected nodes / 处理任何未连接的节点
         for node in nodes:
-            if node['id'] not in node_levels:
-                node_levels[node['id']] = 0
+            if node.id not in node_levels:
+                node_levels[node.id] = 0
         
         return node_levels
     
@@ -1685,92 +1609,80 @@ class OptimizedFlowchartGenerator:
                 
             positions[node_id] = (x, y)
 
-    def _calculate_compact_positions(self, nodes: List[Dict], layout: str, canvas_width: float, canvas_height: float) -> Dict[str, Tuple[float, float]]:
-        """Legacy compact position calculation (kept for compatibility) / 传统紧凑位置计算（保持兼容性）"""
-        positions = {}
-        node_count = len(nodes)
-        
-        if layout == "left-right":
-            # Tight horizontal arrangement / 紧密水平排列
-            if node_count == 1:
-                positions[nodes[0]['id']] = (canvas_width / 2, canvas_height / 2)
-            else:
-                # Calculate positions with minimal spacing / 计算最小间距的位置
-                start_x = self.margin_x + self.node_width / 2
-                end_x = canvas_width - self.margin_x - self.node_width / 2
-                
-                if node_count > 1:
-                    x_step = (end_x - start_x) / (node_count - 1)
-                else:
-                    x_step = 0
-                
-                y_center = canvas_height / 2
-                
-                for i, node in enumerate(nodes):
-                    x = start_x + i * x_step
-                    positions[node['id']] = (x, y_center)
-        
-        else:  # top-bottom
-            # Tight vertical arrangement / 紧密垂直排列
-            if node_count == 1:
-                positions[nodes[0]['id']] = (canvas_width / 2, canvas_height / 2)
-            else:
-                # Calculate positions with minimal spacing / 计算最小间距的位置
-                start_y = canvas_height - self.margin_y - self.node_height / 2
-                end_y = self.margin_y + self.node_height / 2
-                
-                if node_count > 1:
-                    y_step = (start_y - end_y) / (node_count - 1)
-                else:
-                    y_step = 0
-                
-                x_center = canvas_width / 2
-                
-                for i, node in enumerate(nodes):
-                    y = start_y - i * y_step
-                    positions[node['id']] = (x_center, y)
-        
-        return positions
+    def _prepare_draw_data(self, nodes: List[FlowNode], xy: np.ndarray, theme: Optional[Dict[str, Any]] = None) -> List[Tuple[float, float, str, str, str, FlowNode, str]]:
+        """
+        Resolve per-node drawing inputs (position, type, shape, fill color, display label) in one pass
+        一次性解析每个节点的绘制输入（位置、类型、形状、填充色、显示文本）
+        """
+        if theme is None:
+            theme = self.get_current_theme()
+        node_colors = theme['node_colors']
+        default_color = node_colors['default']
+        default_shape = self.node_shapes['default']
+        
+        # (shape, color) per node type, resolved once per distinct type / 按节点类型缓存（形状、颜色），每种类型只解析一次
+        type_styles = {}
+        
+        draw_data = []
+        for node, (x, y) in zip(nodes, xy.tolist()):
+            node_type = node.type
+            style = type_styles.get(node_type)
+            if style is None:
+                style = type_styles[node_type] = (
+                    # Decision nodes are always diamonds / 决策节点始终为菱形
+                    'diamond' if node_type == 'decision' else self.node_shapes.get(node_type, default_shape),
+                    node_colors.get(node_type, default_color)
+                )
+            draw_data.append((
+                x, y, node_type, *style,
+                node,
+                # 优化文本处理：不截断，允许超出框体，但为太长的文本进行智能换行
+                self._format_text_for_display(node.label)
+            ))
+        return draw_data
     
-    def _draw_compact_node(self, ax, node: Dict, position: Tuple[float, float]):
-        """Draw a compact node with enhanced visual effects and theme support"""
-        x, y = position
-        node_type = node.get('type', 'default')
-        label = node.get('label', '')
-        
-        # 优化文本处理：不截断，允许超出框体
-        # 但为太长的文本进行智能换行
-        display_label = self._format_text_for_display(label)
-        
-        # Get current theme / 获取当前主题
-        theme = self.get_current_theme()
-        color = theme['node_colors'].get(node_type, theme['node_colors']['default'])
+    def _draw_compact_nodes(self, ax, nodes: List[FlowNode], xy: np.ndarray, theme: Optional[Dict[str, Any]] = None):
+        """
+        Draw all compact nodes (shadows and shapes) as one patch collection, then their labels
+        将所有紧凑节点（阴影和形状）绘制为一个图形集合，然后绘制文本
+        """
+        # Theme is resolved once per render by the caller / 主题由调用方在每次渲染时解析一次
+        if theme is None:
+            theme = self.get_current_theme()
         text_color = theme['text_color']
         border_color = theme['border_color']
         
-        # Get node shape / 获取节点形状
-        shape = self.node_shapes.get(node_type, self.node_shapes['default'])
-        
-        # Draw shadow first if enabled / 如果启用阴影，先绘制阴影
-        if self.shadow_enabled:
-            shadow_x = x + self.shadow_offset[0]
-            shadow_y = y + self.shadow_offset[1]
-            shadow_patch = self._create_node_patch(shadow_x, shadow_y, shape, node_type, 
-                                                 '#00000040', '#00000040', alpha=0.3, node=node)
-            ax.add_patch(shadow_patch)
+        draw_data = self._prepare_draw_data(nodes, xy, theme)
+        patches = []
         
-        # Create main node patch / 创建主节点补丁
-        node_patch = self._create_node_patch(x, y, shape, node_type, color, border_color, node=node)
+        # Effect switches are read once per render, not per node / 效果开关每次渲染只读取一次，而非每个节点读取
+        shadow_enabled = self.shadow_enabled
+        gradient_enabled = self.gradient_enabled
+        shadow_dx, shadow_dy = self.shadow_offset
         
-        # Add gradient effect if enabled / 如果启用渐变效果
-        if self.gradient_enabled:
-            node_patch = self._apply_gradient_effect(node_patch, color)
+        for x, y, node_type, shape, color, node, _ in draw_data:
+            # Shadow goes right before its node so the stacking order is unchanged / 阴影紧挨在节点之前，保持原有叠放顺序
+            if shadow_enabled:
+                shadow_x = x + shadow_dx
+                shadow_y = y + shadow_dy
+                patches.append(self._create_node_patch(shadow_x, shadow_y, shape, node_type, 
+                                                       '#00000040', '#00000040', alpha=0.3, node=node))
+            
+            # Create main node patch / 创建主节点补丁
+            node_patch = self._create_node_patch(x, y, shape, node_type, color, border_color, node=node)
+            
+            # Add gradient effect if enabled / 如果启用渐变效果
+            if gradient_enabled:
+                node_patch = self._apply_gradient_effect(node_patch, color)
+            
+            patches.append(node_patch)
         
-        ax.add_patch(node_patch)
+        ax.add_collection(PatchCollection(patches, match_original=True))
         
         # 增强文本渲染：支持多行和自适应字体大小
-        self._draw_enhanced_text(ax, x, y, display_label, text_color)
-        
+        for x, y, _, _, _, _, display_label in draw_data:
+            self._draw_enhanced_text(ax, x, y, display_label, text_color)
+    
     def _format_text_for_display(self, text: str) -> str:
         """
         格式化文本以优化显示，支持智能换行和超出框显示，特别优化英文文本
@@ -1779,9 +1691,12 @@ class OptimizedFlowchartGenerator:
         if not text:
             return ''
         
+        # Length is measured once and reused by every threshold check / 长度只计算一次，供各阈值判断复用
+        text_len = len(text)
+        
         # 检测是否为英文文本
         english_chars = sum(1 for c in text if c.isalpha() and ord(c) < 128 or c.isspace())
-        is_english = english_chars / max(1, len(text)) > 0.6
+        is_english = english_chars / text_len > 0.6
         
         # 英文文本和中文文本使用不同的阈值
         if is_english:
@@ -1794,11 +1709,11 @@ class OptimizedFlowchartGenerator:
             long_threshold = 40   # 中文长文本阈值
             
         # 如果文本较短，直接返回
-        if len(text) <= short_threshold:
+        if text_len <= short_threshold:
             return text
             
         # 对于中等长度文本，尝试智能换行
-        if len(text) <= medium_threshold:
+        if text_len <= medium_threshold:
             if is_english:
                 # 英文文本：在空格或连字符处分行
                 return self._format_english_text_medium(text)
@@ -1807,7 +1722,7 @@ class OptimizedFlowchartGenerator:
                 return self._format_chinese_text_medium(text)
         
         # 对于较长文本，进行多行换行
-        if len(text) <= long_threshold:
+        if text_len <= long_threshold:
             if is_english:
                 return self._format_english_text_long(text)
             else:
@@ -2004,7 +1919,7 @@ class OptimizedFlowchartGenerator:
                path_effects=[PathEffects.withStroke(linewidth=2, foreground='white', alpha=0.3)]) # 添加描边效果增强粗细
     
     def _create_node_patch(self, x: float, y: float, shape: str, node_type: str, 
-                          fill_color: str, border_color: str, alpha: float = 1.0, node: Optional[Dict] = None):
+                          fill_color: str, border_color: str, alpha: float = 1.0, node: Optional[FlowNode] = None):
         """
         Create a node patch with specified shape and colors
         创建指定形状和颜色的节点补丁
@@ -2015,33 +1930,40 @@ class OptimizedFlowchartGenerator:
         else:
             width, height = self.node_width, self.node_height
         
-        if shape == 'diamond' or node_type == 'decision':
-            # Diamond shape for decision nodes / 决策节点使用菱形
-            diamond_width, diamond_height = width * 0.9, height * 0.9
-            # Create diamond using polygon
-            diamond_points = [
-                [x, y + diamond_height/2],      # Top
-                [x + diamond_width/2, y],       # Right
-                [x, y - diamond_height/2],      # Bottom
-                [x - diamond_width/2, y]        # Left
-            ]
-            from matplotlib.patches import Polygon
-            patch = Polygon(diamond_points, facecolor=fill_color, 
-                          edgecolor=border_color, linewidth=self.border_width, alpha=alpha)
-        elif shape == 'round':
-            # Rounded rectangle for start/end nodes / 开始/结束节点使用圆角矩形
-            patch = FancyBboxPatch((x - width/2, y - height/2), width, height,
-                                 boxstyle="round,pad=0.1", 
-                                 facecolor=fill_color, edgecolor=border_color, 
-                                 linewidth=self.border_width, alpha=alpha)
-        else:  # 'rect' - regular rectangle
-            # Regular rectangle for process nodes / 处理节点使用矩形
-            patch = FancyBboxPatch((x - width/2, y - height/2), width, height,
-                                 boxstyle="round,pad=0.02",
-                                 facecolor=fill_color, edgecolor=border_color, 
-                                 linewidth=self.border_width, alpha=alpha)
-        
-        return patch
+        factory = self._patch_factories.get(shape, self._make_rect_patch)
+        return factory(x, y, width, height, fill_color, border_color, alpha)
+    
+    def _make_diamond_patch(self, x: float, y: float, width: float, height: float,
+                            fill_color: str, border_color: str, alpha: float):
+        """Diamond shape for decision nodes / 决策节点使用菱形"""
+        diamond_width, diamond_height = width * 0.9, height * 0.9
+        # Create diamond using polygon
+        diamond_points = [
+            [x, y + diamond_height/2],      # Top
+            [x + diamond_width/2, y],       # Right
+            [x, y - diamond_height/2],      # Bottom
+            [x - diamond_width/2, y]        # Left
+        ]
+        return Polygon(diamond_points, facecolor=fill_color, 
+                       edgecolor=border_color, linewidth=self.border_width, alpha=alpha)
+    
+    def _make_round_patch(self, x: float, y: float, width: float, height: float,
+                          fill_color: str, border_color: str, alpha: float):
+        """Rounded rectangle for start/end nodes / 开始/结束节点使用圆角矩形"""
+        return FancyBboxPatch((x - width/2, y - height/2), width, height,
+                              boxstyle="round,pad=0.1", 
+                              facecolor=fill_color, edgecolor=border_color, 
+                              linewidth=self.border_width, alpha=alpha)
+    
+    def _make_rect_patch(self, x: float, y: float, width: float, height: float,
+                         fill_color: str, border_color: str, alpha: float):
+        """Regular rectangle for process nodes / 处理节点使用矩形"""
+        # Plain rectangle grown by the former 0.02 box padding; its 0.02 corner radius was sub-pixel-sized
+        # 普通矩形，按原0.02的边框内边距扩展；原0.02的圆角半径肉眼不可见
+        pad = 0.02
+        return Rectangle((x - width/2 - pad, y - height/2 - pad), width + 2 * pad, height + 2 * pad,
+                         facecolor=fill_color, edgecolor=border_color, 
+                         linewidth=self.border_width, alpha=alpha)
     
     def _apply_gradient_effect(self, patch, base_color: str):
         """
@@ -2052,113 +1974,90 @@ class OptimizedFlowchartGenerator:
         # In a more advanced implementation, we could use matplotlib's gradient fills
         return patch
     
-    def _draw_intelligent_connection(self, ax, connection: Dict, positions: Dict[str, Tuple[float, float]], layout: str, nodes: List[Dict], connections: List[Dict]):
-        """Draw intelligent connection between nodes with branch-aware routing and label-based coloring / 绘制智能节点连接，具有分支感知路由和基于标签的颜色"""
-        from_id = connection['from']
-        to_id = connection['to']
-        connection_label = connection.get('label', '')
-        
-        if from_id not in positions or to_id not in positions:
+    def _draw_intelligent_connections(self, ax, graph: GraphArrays, xy: np.ndarray, layout: str, structure_analysis: Dict[str, Any],
+                                      theme: Optional[Dict[str, Any]] = None):
+        """
+        Route and draw all connections at once with branch-aware routing and label-based coloring
+        一次性路由并绘制所有连接，具有分支感知路由和基于标签的颜色
+        """
+        if not len(graph.edges_src):
             return
+        if theme is None:
+            theme = self.get_current_theme()
+        connection_width = theme['connection_width']
         
-        from_pos = positions[from_id]
-        to_pos = positions[to_id]
-        
-        # Analyze flowchart structure to detect branches / 分析流程图结构以检测分支
-        structure_analysis = self._analyze_flowchart_structure(nodes, connections)
-        has_branches = structure_analysis['has_branches']
-        branch_nodes = structure_analysis['branch_nodes']
+        from_xy = xy[graph.edges_src]
+        to_xy = xy[graph.edges_dst]
+        dx = to_xy[:, 0] - from_xy[:, 0]
+        dy = to_xy[:, 1] - from_xy[:, 1]
         
-        # Calculate connection points based on node positions / 根据节点位置计算连接点
-        from_x, from_y = from_pos
-        to_x, to_y = to_pos
+        # If there are branches, edges touching a branch node use direct arrows to avoid overlap
+        # 如果有分支，与分支节点相连的连接使用直接箭头以避免重叠
+        if structure_analysis['has_branches']:
+            is_branch_node = np.isin(graph.ids, structure_analysis['branch_nodes'])
+            on_branch = is_branch_node[graph.edges_src] | is_branch_node[graph.edges_dst]
+        else:
+            on_branch = np.zeros(len(dx), dtype=bool)
         
-        # Determine optimal connection style based on branch detection / 根据分支检测确定最佳连接样式
-        dx = to_x - from_x
-        dy = to_y - from_y
+        # Layout-based routing: direct along the main flow, stepped (L-shaped) otherwise, turning at 70%
+        # 基于布局的路由：沿主流向直接连接，否则使用阶梯（L形）连接，在70%处转弯
+        mid_xy = from_xy.copy()
+        if layout == "left-right":
+            # For left-right layout, prefer horizontal flow; go horizontal first / 左右布局优先水平流向，先水平后垂直
+            direct = on_branch | (np.abs(dx) > np.abs(dy))
+            mid_xy[:, 0] += dx * 0.7
+        else:  # top-bottom
+            # For top-bottom layout, prefer vertical flow; go vertical first / 上下布局优先垂直流向，先垂直后水平
+            direct = on_branch | (np.abs(dy) > np.abs(dx))
+            mid_xy[:, 1] += dy * 0.7
+        stepped = ~direct
+        
+        colors = [self._get_connection_color(label, theme) for label in graph.edge_labels]
+        
+        # Arrows start at the source for direct edges and at the turn point for stepped ones
+        # 直接连接的箭头从源节点开始，阶梯连接的箭头从转弯点开始
+        self._draw_arrow_collection(
+            ax,
+            np.where(direct[:, None], from_xy, mid_xy),
+            to_xy,
+            np.where(direct, 35.0, 5.0),
+            np.full(len(dx), 35.0),
+            np.where(direct, 18.0, 16.0),
+            colors,
+            connection_width
+        )
         
-        # If there are branches, use direct connections to avoid overlap / 如果有分支，使用直接连接以避免重叠
-        if has_branches and (from_id in branch_nodes or to_id in branch_nodes):
-            # For branch scenarios, always use direct arrows to prevent element overlap
-            # 对于分支场景，始终使用直接箭头以防止元素重叠
-            self._draw_direct_arrow(ax, from_pos, to_pos, connection_label)
-        else:
-            # For non-branch scenarios, use layout-based routing / 对于非分支场景，使用基于布局的路由
-            if layout == "left-right":
-                # For left-right layout, prefer horizontal flow / 左右布局优先水平流向
-                if abs(dx) > abs(dy):  # Mostly horizontal
-                    # Direct horizontal connection / 直接水平连接
-                    self._draw_direct_arrow(ax, from_pos, to_pos, connection_label)
-                else:  # Mostly vertical (multi-row case)
-                    # Draw stepped connection for better readability / 绘制阶梯连接以提高可读性
-                    self._draw_stepped_connection(ax, from_pos, to_pos, "horizontal-first", connection_label)
-            else:  # top-bottom
-                # For top-bottom layout, prefer vertical flow / 上下布局优先垂直流向
-                if abs(dy) > abs(dx):  # Mostly vertical
-                    # Direct vertical connection / 直接垂直连接
-                    self._draw_direct_arrow(ax, from_pos, to_pos, connection_label)
-                else:  # Mostly horizontal (multi-column case)
-                    # Draw stepped connection for better readability / 绘制阶梯连接以提高可读性
-                    self._draw_stepped_connection(ax, from_pos, to_pos, "vertical-first", connection_label)
+        if stepped.any():
+            # First leg of stepped connections is a plain line / 阶梯连接的第一段为直线
+            ax.add_collection(LineCollection(np.stack([from_xy[stepped], mid_xy[stepped]], axis=1),
+                                             colors=[color for color, step in zip(colors, stepped) if step],
+                                             linewidths=connection_width, alpha=0.9,
+                                             capstyle='projecting', zorder=2), autolim=False)
         
         # 如果有标签，在箭头中间绘制标签文本
-        if connection_label:
-            self._draw_connection_label(ax, from_pos, to_pos, connection_label)
-    
-    def _draw_direct_arrow(self, ax, from_pos: Tuple[float, float], to_pos: Tuple[float, float], connection_label: str = ''):
-        """Draw a direct arrow connection with theme support and label-based coloring / 绘制带主题支持和标签颜色的直接箭头连接"""
-        theme = self.get_current_theme()
-        connection_color = self._get_connection_color(connection_label)
-        connection_width = theme['connection_width']
-        
-        arrow = ConnectionPatch(from_pos, to_pos, "data", "data",
-                              arrowstyle="->", shrinkA=35, shrinkB=35,
-                              mutation_scale=18, fc=connection_color, ec=connection_color,
-                              linewidth=connection_width, alpha=0.9)
-        ax.add_patch(arrow)
+        for i, label in enumerate(graph.edge_labels):
+            if label:
+                self._draw_connection_label(ax, tuple(from_xy[i]), tuple(to_xy[i]), label, colors[i])
     
-    def _draw_stepped_connection(self, ax, from_pos: Tuple[float, float], to_pos: Tuple[float, float], direction: str, connection_label: str = ''):
-        """Draw a stepped connection (L-shaped) with theme support and label-based coloring / 绘制带主题支持和标签颜色的阶梯连接（L形）"""
-        from_x, from_y = from_pos
-        to_x, to_y = to_pos
-        
-        # Get theme colors / 获取主题颜色
-        theme = self.get_current_theme()
-        connection_color = self._get_connection_color(connection_label)
-        connection_width = theme['connection_width']
+    def _draw_arrow_collection(self, ax, starts: np.ndarray, ends: np.ndarray, shrink_a: np.ndarray,
+                               shrink_b: np.ndarray, mutation: np.ndarray, colors: List[str], connection_width: float):
+        """
+        Draw "->" arrows between point pairs as one LineCollection
+        将成对端点之间的"->"箭头绘制为一个LineCollection
+
+        Geometry comes from arrow_segments, which reproduces ConnectionPatch's "->" style
+        箭头几何由arrow_segments计算，复现ConnectionPatch的"->"样式
+        """
+        segments, kept = arrow_segments(ax, starts, ends, shrink_a, shrink_b, mutation, connection_width)
+        segment_colors = [colors[i] for i in kept for _ in range(2)]
         
-        if direction == "horizontal-first":
-            # Go horizontal first, then vertical / 先水平后垂直
-            mid_x = from_x + (to_x - from_x) * 0.7  # 70% of the way horizontally
-            mid_y = from_y
-            
-            # Draw first segment (horizontal) / 绘制第一段（水平）
-            ax.plot([from_x, mid_x], [from_y, mid_y], color=connection_color, 
-                   linewidth=connection_width, alpha=0.9)
-            
-            # Draw second segment (vertical) with arrow / 绘制第二段（垂直）带箭头
-            arrow = ConnectionPatch((mid_x, mid_y), to_pos, "data", "data",
-                                  arrowstyle="->", shrinkA=5, shrinkB=35,
-                                  mutation_scale=16, fc=connection_color, ec=connection_color,
-                                  linewidth=connection_width, alpha=0.9)
-            ax.add_patch(arrow)
-        else:  # vertical-first
-            # Go vertical first, then horizontal / 先垂直后水平
-            mid_x = from_x
-            mid_y = from_y + (to_y - from_y) * 0.7  # 70% of the way vertically
-            
-            # Draw first segment (vertical) / 绘制第一段（垂直）
-            ax.plot([from_x, mid_x], [from_y, mid_y], color=connection_color,
-                   linewidth=connection_width, alpha=0.9)
-            
-            # Draw second segment (horizontal) with arrow / 绘制第二段（水平）带箭头
-            arrow = ConnectionPatch((mid_x, mid_y), to_pos, "data", "data",
-                                  arrowstyle="->", shrinkA=5, shrinkB=35,
-                                  mutation_scale=16, fc=connection_color, ec=connection_color,
-                                  linewidth=connection_width, alpha=0.9)
-            ax.add_patch(arrow)
+        # Snapping is off to match ConnectionPatch's curve-based path / 关闭像素对齐，与ConnectionPatch的曲线路径一致
+        ax.add_collection(LineCollection(segments, colors=segment_colors, linewidths=connection_width,
+                                         alpha=0.9, capstyle='round', joinstyle='round',
+                                         zorder=1, clip_on=False, snap=False), autolim=False)
     
-    def _draw_connection_label(self, ax, from_pos: Tuple[float, float], to_pos: Tuple[float, float], label: str):
+    def _draw_connection_label(self, ax, from_pos: Tuple[float, float], to_pos: Tuple[float, float], label: str,
+                               label_color: Optional[str] = None):
         """
         Draw connection label at the middle of the arrow
         在箭头中间绘制连接标签
@@ -2170,9 +2069,9 @@ class OptimizedFlowchartGenerator:
         mid_x = (from_pos[0] + to_pos[0]) / 2
         mid_y = (from_pos[1] + to_pos[1]) / 2
         
-        # 获取主题颜色
-        theme = self.get_current_theme()
-        label_color = self._get_connection_color(label)
+        # 获取主题颜色（调用方已解析时直接使用）
+        if label_color is None:
+            label_color = self._get_connection_color(label)
         
         # 绘制标签背景（小圆角矩形）
         label_bg = mpatches.FancyBboxPatch(
@@ -2190,21 +2089,47 @@ class OptimizedFlowchartGenerator:
                fontsize=7, weight='heavy', color='white',  # 使用最粗的字体设置
                fontproperties=self.chinese_font, zorder=9,
                path_effects=[PathEffects.withStroke(linewidth=1.5, foreground='black', alpha=0.8)]) # 添加黑色描边增强粗细
-    
-    def _draw_compact_connection(self, ax, connection: Dict, positions: Dict[str, Tuple[float, float]]):
-        """Legacy compact connection drawing (kept for compatibility) / 传统紧凑连接绘制（保持兼容性）"""
-        from_id = connection['from']
-        to_id = connection['to']
-        
-        if from_id not in positions or to_id not in positions:
-            return
-        
-        from_pos = positions[from_id]
-        to_pos = positions[to_id]
-        
-        # Compact arrow / 紧凑箭头
-        arrow = ConnectionPatch(from_pos, to_pos, "data", "data",
-                              arrowstyle="->", shrinkA=35, shrinkB=35,
-                              mutation_scale=15, fc="black", ec="black",
-                              linewidth=1.5)
-        ax.add_patch(arrow)
+
+
+# Generator shared by the flowchart tools, created on first use / 流程图工具共享的生成器，首次使用时创建
+_GENERATOR: Optional[OptimizedFlowchartGenerator] = None
+_GENERATOR_LOCK = threading.Lock()
+
+
+def get_generator() -> OptimizedFlowchartGenerator:
+    """
+    Return the process-wide OptimizedFlowchartGenerator
+    返回进程内共享的OptimizedFlowchartGenerator
+    """
+    global _GENERATOR
+    if _GENERATOR is None:
+        with _GENERATOR_LOCK:
+            if _GENERATOR is None:
+                _GENERATOR = OptimizedFlowchartGenerator()
+    return _GENERATOR
+
+
+def _warm_up():
+    """
+    Pay the one-off setup costs (generator, fonts, Agg text and PNG encoding) ahead of the first request
+    提前完成一次性初始化（生成器、字体、Agg文本渲染和PNG编码），避免首个请求承担延迟
+    """
+    try:
+        generator = get_generator()
+        fig = Figure(figsize=(1, 1))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        ax.text(0.5, 0.5, 'Warm up 预热', weight='heavy', fontproperties=generator.chinese_font,
+                path_effects=[PathEffects.withStroke(linewidth=1.5, foreground='black')])
+        fig.savefig(io.BytesIO(), format='png', dpi=10, pil_kwargs={'compress_level': generator.png_compress_level})
+    except Exception as e:
+        print(f"Warning: Flowchart warm-up failed: {e}")
+
+
+
+def start_warm_up() -> None:
+    """
+    Warm up in a background thread so the plugin's startup is not delayed
+    在后台线程中预热，不阻塞插件启动
+    """
+    threading.Thread(target=_warm_up, name='flowchart-warm-up', daemon=True).start()
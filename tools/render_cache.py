@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Render Cache
+渲染缓存
+
+Content-addressed LRU cache for rendered flowchart images, with an optional
+on-disk layer enabled through the FLOW_MAP_CACHE_DIR environment variable.
+按内容寻址的流程图渲染结果LRU缓存，可通过环境变量FLOW_MAP_CACHE_DIR启用磁盘缓存层。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Bump when the rendered output changes so stale entries are never reused / 渲染结果变化时递增，避免复用过期缓存
+RENDER_CACHE_VERSION = "7"
+
+
+class RenderCache:
+    """
+    Thread-safe LRU cache keyed by a SHA-256 digest of the render inputs
+    以渲染输入的SHA-256摘要为键的线程安全LRU缓存
+
+    Entries are dicts holding the PNG under "png_data" plus JSON-serializable
+    metadata. When cache_dir is set, entries are also persisted there as
+    <key>.png / <key>.json so they survive process restarts.
+    缓存条目为字典，"png_data"保存PNG字节，其余为可JSON序列化的元数据。
+    设置cache_dir后，条目同时以 <key>.png / <key>.json 持久化到磁盘，进程重启后仍可复用。
+    """
+
+    def __init__(self, max_entries: int = 128, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: Any) -> bytes:
+        """
+        Build a cache key from the render inputs
+        根据渲染输入生成缓存键
+        """
+        digest = hashlib.sha256(RENDER_CACHE_VERSION.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(str(part).encode('utf-8'))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return the cached value and mark it as recently used / 返回缓存值并标记为最近使用"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+
+        # Fall back to the disk layer / 回退到磁盘缓存层
+        value = self._load(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        """Store a value, evicting the oldest entries when full / 存储缓存值，超出容量时淘汰最旧的条目"""
+        self._remember(key, value)
+        self._store(key, value)
+
+    def _remember(self, key: bytes, value: Any) -> None:
+        """Insert into the in-memory LRU / 写入内存LRU"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _paths(self, key: bytes):
+        """Disk paths for an entry / 缓存条目的磁盘路径"""
+        base = os.path.join(self.cache_dir, key.hex())
+        return base + '.png', base + '.json'
+
+    def _load(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Read an entry from disk, if present / 从磁盘读取缓存条目（如存在）"""
+        if not self.cache_dir:
+            return None
+        png_path, meta_path = self._paths(key)
+        try:
+            # Metadata is written last, so its presence means the entry is complete / 元数据最后写入，存在即表示条目完整
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            with open(png_path, 'rb') as f:
+                value['png_data'] = f.read()
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: bytes, value: Dict[str, Any]) -> None:
+        """Persist an entry to disk; failures only cost a future cache miss / 将条目写入磁盘，失败只会导致之后未命中"""
+        if not self.cache_dir:
+            return
+        png_path, meta_path = self._paths(key)
+        metadata = {name: item for name, item in value.items() if name != 'png_data'}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write_atomic(png_path, value['png_data'])
+            self._write_atomic(meta_path, json.dumps(metadata).encode('utf-8'))
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """Write via a temp file and rename so readers never see partial files / 先写临时文件再重命名，避免读到不完整文件"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def clear(self) -> None:
+        """Drop all in-memory entries / 清空内存中的缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Cache shared by the flowchart tools / 流程图工具共享的缓存
+png_cache = RenderCache(cache_dir=os.environ.get('FLOW_MAP_CACHE_DIR') or None)